@@ -0,0 +1,69 @@
+import pandas as pd
+
+# Every rollup is keyed by artist × year × country, plus one more dimension,
+# so the dashboard's year and country filters apply to all of them.
+ROLLUPS = {
+    "agg_country": None,
+    "agg_city": "venue_city",
+    "agg_venue": "venue",
+    "agg_month": "month",
+    "agg_weekday": "weekday",
+}
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def _schema():
+    statements = []
+    for table, dimension in ROLLUPS.items():
+        extra = f"{dimension} {'INTEGER' if dimension == 'month' else 'TEXT'}, " if dimension else ""
+        statements.append(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                artist_id INTEGER NOT NULL,
+                year INTEGER NOT NULL,
+                venue_country TEXT,
+                {extra}shows INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_{table}_artist_year ON {table} (artist_id, year);
+        """)
+    return "\n".join(statements)
+
+
+SCHEMA = _schema()
+
+
+def add_date_parts(df):
+    # event_date is already canonical, so this is an exact-format parse
+    df = df.dropna(subset=['event_date'])
+    event_date = pd.to_datetime(df['event_date'], format='%Y-%m-%d')
+    df['year'] = event_date.dt.year
+    df['month'] = event_date.dt.month
+    df['weekday'] = event_date.dt.day_name()
+    return df
+
+
+def refresh_artist_rollups(conn, artist_ids):
+    """Recompute the rollups of the given artists from their deduplicated rows in `shows`."""
+    for artist_id in artist_ids:
+        events = pd.read_sql(
+            "SELECT event_date, venue, venue_city, venue_country FROM shows WHERE artist_id = ?",
+            conn, params=(artist_id,)
+        )
+        events = add_date_parts(events)
+
+        for table, dimension in ROLLUPS.items():
+            keys = ["year", "venue_country"] + ([dimension] if dimension else [])
+            counts = events.groupby(keys, dropna=False).size().reset_index(name="shows")
+            counts = counts.astype(object).where(counts.notna(), None)
+            conn.execute(f"DELETE FROM {table} WHERE artist_id = ?", (artist_id,))
+            conn.executemany(
+                f"INSERT INTO {table} (artist_id, {', '.join(keys)}, shows) VALUES (?, {', '.join('?' for _ in keys)}, ?)",
+                [(artist_id, *row) for row in counts[keys + ["shows"]].itertuples(index=False)]
+            )
+
+
+def load_rollups(conn, artist_id):
+    return {
+        table: pd.read_sql(f"SELECT * FROM {table} WHERE artist_id = ?", conn, params=(artist_id,))
+        for table in ROLLUPS
+    }
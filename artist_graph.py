@@ -0,0 +1,226 @@
+import argparse
+import heapq
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from similar_artists import (MAX_WORKERS, BudgetExhausted, CallBudget, cache, get_artist, get_artists_by_id, sp,
+                             spotify_call)
+
+STRATEGIES = ("bfs", "best")
+NODE_FIELDS = ["id", "name", "followers", "popularity", "genres", "hop", "score"]
+
+
+def genre_overlap(a, b):
+    a, b = set(a or ()), set(b or ())
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def edge_weight(rank, total, genres_a, genres_b):
+    """Spotify lists related artists most similar first; blend that rank with genre overlap when there are genres."""
+    rank_weight = 1 - rank / max(total, 1)
+    if not genres_a or not genres_b:
+        return round(rank_weight, 4)
+    return round(0.6 * rank_weight + 0.4 * genre_overlap(genres_a, genres_b), 4)
+
+
+class ArtistGraph:
+    """
+    Weighted similarity graph grown outward from seed artists over Spotify's
+    related-artist edges. A node's score is its best path to any seed, the
+    product of edge weights along the way, so seeds score 1.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.edges = {}
+        self.truncated = None
+
+    def add_node(self, artist, hop, score):
+        node = self.nodes.get(artist["id"])
+        if node is None:
+            node = self.nodes[artist["id"]] = {"id": artist["id"], "hop": hop, "score": score}
+        else:
+            node["hop"] = min(node["hop"], hop)
+            node["score"] = max(node["score"], score)
+        node["name"] = artist.get("name", node.get("name"))
+        if "followers" in artist:
+            node["followers"] = artist["followers"]["total"]
+            node["popularity"] = artist.get("popularity")
+            node["genres"] = artist.get("genres", [])
+        return node
+
+    def add_edge(self, a, b, weight):
+        key = (a, b) if a < b else (b, a)
+        self.edges[key] = max(weight, self.edges.get(key, 0.0))
+
+    def to_frames(self):
+        nodes = pd.DataFrame([{field: node.get(field) for field in NODE_FIELDS} for node in self.nodes.values()],
+                             columns=NODE_FIELDS)
+        nodes["genres"] = nodes["genres"].map(lambda g: "|".join(g) if isinstance(g, list) else "")
+        nodes = nodes.sort_values("score", ascending=False, kind="stable").reset_index(drop=True)
+        edges = pd.DataFrame([(a, b, w) for (a, b), w in self.edges.items()], columns=["source", "target", "weight"])
+        return nodes, edges
+
+    def export(self, prefix):
+        """Write <prefix>_nodes.csv, <prefix>_edges.csv and a node-link <prefix>.json; returns the paths."""
+        nodes, edges = self.to_frames()
+        nodes.to_csv(f"{prefix}_nodes.csv", index=False)
+        edges.to_csv(f"{prefix}_edges.csv", index=False)
+        with open(f"{prefix}.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "directed": False,
+                "truncated": self.truncated,
+                "nodes": list(self.nodes.values()),
+                "links": [{"source": a, "target": b, "weight": w} for (a, b), w in self.edges.items()],
+            }, f)
+        return [f"{prefix}_nodes.csv", f"{prefix}_edges.csv", f"{prefix}.json"]
+
+    def ranked_names(self):
+        return [node["name"] for node in sorted(self.nodes.values(), key=lambda n: -n["score"])]
+
+
+def _related(artist_id, budget):
+    return spotify_call(sp.artist_related_artists, artist_id, budget=budget)["artists"]
+
+
+def expand_graph(seed_names, max_hops=2, budget=500, strategy="bfs", max_nodes=5000, batch_size=MAX_WORKERS):
+    """
+    Walk related-artist edges out from the seeds, breadth-first or best-first
+    (highest score first). Each round takes up to `batch_size` artists off the
+    frontier, never more than the budget has left, and fetches their related
+    artists in parallel. No artist is expanded twice; one still waiting is
+    re-queued when a better path to it turns up, and one whose related
+    artists can't be fetched is logged and skipped. Nodes returned without
+    follower data are filled in 50 at a time. Stops once the frontier is empty,
+    `max_nodes` artists are known or `budget` API calls (cache misses) are
+    spent; a budget stop is recorded in `graph.truncated`.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}'; use one of {', '.join(STRATEGIES)}")
+    budget = budget if isinstance(budget, CallBudget) else CallBudget(budget)
+    graph = ArtistGraph()
+    frontier = deque() if strategy == "bfs" else []
+    queued = {}  # artist id -> (hop, score) it was last queued with
+    expanded = set()
+    unresolved = set()  # ids Spotify had no artist details for
+    order = 0
+
+    def push(artist_id):
+        nonlocal order
+        node = graph.nodes[artist_id]
+        queued[artist_id] = (node["hop"], node["score"])
+        order += 1
+        if strategy == "best":
+            heapq.heappush(frontier, (-node["score"], order, artist_id))
+        else:
+            frontier.append(artist_id)
+
+    def should_push(artist_id):
+        # Re-queue a waiting artist when a better path turns up, so best-first never runs on a stale priority;
+        # the older entry is skipped when popped
+        if artist_id in expanded:
+            return False
+        if artist_id not in queued:
+            return True
+        node = graph.nodes[artist_id]
+        return (node["hop"], -node["score"]) < (queued[artist_id][0], -queued[artist_id][1])
+
+    def pop_batch(size):
+        batch = []
+        while frontier and len(batch) < size:
+            if strategy == "best":
+                neg_score, _, artist_id = heapq.heappop(frontier)
+                if -neg_score < queued[artist_id][1]:
+                    continue
+            else:
+                artist_id = frontier.popleft()
+            if artist_id not in expanded and artist_id not in batch:
+                batch.append(artist_id)
+        return batch
+
+    try:
+        for name in seed_names:
+            seed = get_artist(name, budget=budget)
+            if not seed:
+                print(f"⚠️ Seed artist '{name}' not found.")
+                continue
+            graph.add_node(seed, hop=0, score=1.0)
+            if should_push(seed["id"]):
+                push(seed["id"])
+
+        with ThreadPoolExecutor(max_workers=batch_size) as pool:
+            while frontier and len(graph.nodes) < max_nodes:
+                # Never take more off the frontier than the budget could pay for, so nothing popped goes unexpanded
+                batch = [a for a in pop_batch(min(batch_size, max(budget.remaining, 1)))
+                         if graph.nodes[a]["hop"] < max_hops]
+                if not batch:
+                    continue
+                futures = [(a, pool.submit(_related, a, budget)) for a in batch]
+                results, exhausted = [], None
+                for artist_id, future in futures:
+                    try:
+                        results.append((artist_id, future.result()))
+                    except BudgetExhausted as e:
+                        exhausted = e  # keep what the rest of the batch fetched before stopping
+                    except Exception as e:
+                        # One artist failing (a 404, a dropped connection) shouldn't sink the whole walk
+                        print(f"⚠️ Related artists failed for {graph.nodes[artist_id].get('name') or artist_id}: {e}")
+                        expanded.add(artist_id)
+
+                for artist_id, related in results:
+                    expanded.add(artist_id)
+                    parent = graph.nodes[artist_id]
+                    for rank, artist in enumerate(related):
+                        if artist["id"] not in graph.nodes and len(graph.nodes) >= max_nodes:
+                            break
+                        weight = edge_weight(rank, len(related), parent.get("genres"), artist.get("genres"))
+                        graph.add_node(artist, parent["hop"] + 1, parent["score"] * weight)
+                        graph.add_edge(artist_id, artist["id"], weight)
+                        if should_push(artist["id"]):
+                            push(artist["id"])
+
+                if exhausted:
+                    raise exhausted
+                missing = [a for a, node in graph.nodes.items() if "followers" not in node and a not in unresolved]
+                if missing:
+                    try:
+                        found = get_artists_by_id(missing, budget=budget)
+                    except BudgetExhausted:
+                        raise
+                    except Exception as e:
+                        print(f"⚠️ Artist details lookup failed, will retry next round: {e}")
+                    else:
+                        for artist in found:
+                            graph.add_node(artist, graph.nodes[artist["id"]]["hop"], graph.nodes[artist["id"]]["score"])
+                        # Spotify returns null for these; asking again every round would only spend budget
+                        unresolved.update(set(missing) - {artist["id"] for artist in found})
+
+                print(f"🕸️ {len(graph.nodes)} artists, {len(graph.edges)} edges, {budget.used}/{budget.max_calls} API calls")
+    except BudgetExhausted as e:
+        graph.truncated = str(e)
+        print(f"⚠️ Stopping expansion: {e}")
+
+    return graph
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Grow a similar-artist graph from one or more seeds.")
+    parser.add_argument("seeds", nargs="+", help="seed artist names")
+    parser.add_argument("--hops", type=int, default=2, help="how far from a seed the walk may go")
+    parser.add_argument("--budget", type=int, default=500, help="hard cap on Spotify API calls (cache hits are free)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="bfs")
+    parser.add_argument("--max-nodes", type=int, default=5000)
+    parser.add_argument("--out", default="artist_graph", help="prefix for the exported nodes/edges CSVs and JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    graph = expand_graph(args.seeds, max_hops=args.hops, budget=args.budget, strategy=args.strategy,
+                         max_nodes=args.max_nodes)
+    paths = graph.export(args.out)
+    print(f"🗄️ Spotify cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses")
+    print(f"✅ {len(graph.nodes)} artists and {len(graph.edges)} edges written to {', '.join(paths)}")
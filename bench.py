@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import re
+import resource
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_fixtures")
+RESULTS_PATH = "bench_results.jsonl"
+ARTIST = "Bench Artist"
+BENCHMARKS = ("songkick", "concert_archives", "edmtrain", "resident_advisor")
+
+JSON_LD_SCRIPT_RE = re.compile(r'<script type="application/ld\+json">.*?</script>', re.S)
+TABLE_BODY_RE = re.compile(r"<tbody>.*?</tbody>", re.S)
+
+
+# -------------------- FIXTURE SERVER --------------------
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Serves the recorded pages in bench_fixtures/ under the same paths the real
+    sites use. Paged listings repeat their fixture, with __PAGE__ filled in, for
+    `pages` pages and then come back empty, like the end of a real history.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, pages=10, fixtures_dir=FIXTURES_DIR):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.pages = pages
+        self.fixtures_dir = fixtures_dir
+        self.pages_served = 0
+        self.bytes_served = 0
+        self._fixtures = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def fixture(self, name):
+        if name not in self._fixtures:
+            with open(os.path.join(self.fixtures_dir, name), encoding="utf-8") as f:
+                self._fixtures[name] = f.read()
+        return self._fixtures[name]
+
+    def _paged(self, name, page, empty):
+        text = self.fixture(name)
+        if page > self.pages:
+            return empty(text)
+        return text.replace("__PAGE__", str(page)).replace("__NEXT__", str(page + 1))
+
+    def render(self, url, body=b""):
+        """Return (status, content type, text) for a request path."""
+        parts = urlsplit(url)
+        path, query = parts.path, parse_qs(parts.query)
+        page = int(query.get("page", ["1"])[0])
+        html = "text/html; charset=utf-8"
+
+        if path == "/search":
+            return 200, html, self.fixture("songkick/search.html")
+        if re.fullmatch(r"/artists/[^/]+/gigography", path):
+            return 200, html, self._paged("songkick/gigography.html", page, lambda t: JSON_LD_SCRIPT_RE.sub("", t))
+        if re.fullmatch(r"/artists/[^/]+", path):
+            return 200, html, self.fixture("songkick/artist.html")
+        if re.fullmatch(r"/bands/[^/]+", path):
+            return 200, html, self._paged("concert_archives/band.html", page,
+                                          lambda t: TABLE_BODY_RE.sub("<tbody></tbody>", t))
+        if re.fullmatch(r"/tours/[^/]+", path):
+            return 200, html, self.fixture("edmtrain/tour.html")
+        if re.fullmatch(r"/dj/[^/]+/past-events", path):
+            return 200, html, self.fixture("resident_advisor/past_events.html")
+        if path == "/graphql":
+            page = json.loads(body or b"{}").get("variables", {}).get("page", 1)
+            return 200, "application/json", self._paged("resident_advisor/graphql.json", page,
+                                                         lambda t: '{"data": {"listing": {"data": []}}}')
+        return 404, "text/plain", "not found"
+
+    def count(self, nbytes):
+        with self._lock:
+            self.pages_served += 1
+            self.bytes_served += nbytes
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def _serve(self, body=b""):
+        status, content_type, text = self.server.render(self.path, body)
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if status == 200:
+            self.server.count(len(data))
+
+    def do_GET(self):
+        self._serve()
+
+    def do_POST(self):
+        self._serve(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def log_message(self, *args):
+        pass
+
+
+# -------------------- BENCHMARKS --------------------
+# Each runner imports its scraper in the benchmark's own process, so the
+# *_BASE_URL overrides are read, and returns the timed call that yields an event count.
+def bench_songkick(base_url, pages):
+    from combined_scraper import get_songkick_data
+    return lambda: len(get_songkick_data(ARTIST))
+
+
+def bench_concert_archives(base_url, pages):
+    from combined_scraper import scrape_concert_archives
+    return lambda: len(asyncio.run(scrape_concert_archives(ARTIST, max_pages=pages + 1)))
+
+
+def bench_edmtrain(base_url, pages):
+    from playwright.sync_api import sync_playwright
+    from edmtrain import CONTEXT_OPTIONS, get_artist_events, request_filter
+    from metrics import metrics
+
+    def run():
+        events = 0
+        with sync_playwright() as p:
+            with metrics.timer("browser_start"):
+                browser = p.chromium.launch(headless=True)
+            page = browser.new_page(**CONTEXT_OPTIONS)
+            page.route("**/*", request_filter.handle_sync)
+            # One tour page per "page" so the run is comparable in size to the paged sources
+            for i in range(pages):
+                events += len(get_artist_events(f"{base_url}/tours/bench-artist-{i}", ARTIST, page, timeout=5000))
+            browser.close()
+        return events
+    return run
+
+
+def bench_resident_advisor(base_url, pages):
+    from residentadvisor import scrape_ra_events
+    return lambda: len(asyncio.run(scrape_ra_events("benchartist", artist_name=ARTIST)))
+
+
+RUNNERS = {
+    "songkick": bench_songkick,
+    "concert_archives": bench_concert_archives,
+    "edmtrain": bench_edmtrain,
+    "resident_advisor": bench_resident_advisor,
+}
+
+
+def _run_in_child(name, base_url, pages, results):
+    from metrics import metrics
+
+    run = RUNNERS[name](base_url, pages)
+    metrics.reset()
+    started = time.perf_counter()
+    try:
+        events = run()
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"})
+        return
+    elapsed = time.perf_counter() - started
+
+    stages = {}
+    for source in metrics.summary()["sources"].values():
+        for stage, histogram in source["stages"].items():
+            stages[stage] = round(stages.get(stage, 0) + histogram["sum"], 4)
+    results.put({
+        "events": events,
+        "elapsed_sec": round(elapsed, 4),
+        "stages": stages,
+        # ru_maxrss is in KiB on Linux; Chromium's own memory is not included
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    })
+
+
+def run_benchmark(name, server, timeout=600):
+    """Run one benchmark in a fresh process against `server` and return its measurements."""
+    server.pages_served = 0
+    os.environ.update({
+        "SONGKICK_BASE_URL": server.base_url,
+        "CONCERT_ARCHIVES_BASE_URL": server.base_url,
+        "RA_BASE_URL": server.base_url,
+    })
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    child = context.Process(target=_run_in_child, args=(name, server.base_url, server.pages, results))
+    child.start()
+    try:
+        result = results.get(timeout=timeout)
+    except queue.Empty:
+        child.terminate()
+        result = {"error": f"no result within {timeout}s"}
+    child.join()
+
+    if "error" not in result:
+        elapsed = result["elapsed_sec"] or float("nan")
+        result["pages"] = server.pages_served
+        result["pages_per_sec"] = round(server.pages_served / elapsed, 2)
+        result["events_per_sec"] = round(result["events"] / elapsed, 2)
+    return result
+
+
+# -------------------- RESULTS --------------------
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous(path, pages):
+    """The most recent stored run with the same page count, or None."""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("pages") == pages:
+                    previous = record
+    return previous
+
+
+def _change(new, old):
+    if not old or new is None:
+        return ""
+    return f" ({(new - old) / old:+.0%})"
+
+
+def print_report(results, previous=None):
+    before = (previous or {}).get("results", {})
+    for name, result in results.items():
+        if "error" in result:
+            print(f"⚠️ {name}: skipped ({result['error']})")
+            continue
+        old = before.get(name, {})
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in sorted(result["stages"].items()))
+        print(f"📊 {name}: {result['pages']} pages, {result['events']} events in {result['elapsed_sec']:.2f}s | "
+              f"{result['pages_per_sec']} pages/s{_change(result['pages_per_sec'], old.get('pages_per_sec'))}, "
+              f"{result['events_per_sec']} events/s{_change(result['events_per_sec'], old.get('events_per_sec'))}, "
+              f"peak RSS {result['peak_rss_mb']} MB{_change(result['peak_rss_mb'], old.get('peak_rss_mb'))}")
+        print(f"   ⏱️ {stages}")
+    if previous:
+        print(f"↔️ Changes are against the run of {previous['timestamp']} (commit {previous.get('commit')}).")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers offline against recorded fixture pages.")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--pages", type=int, default=10, help="pages each paged listing has before it runs out")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per benchmark; the median run is kept")
+    parser.add_argument("--timeout", type=int, default=600, help="seconds before a benchmark run is abandoned")
+    parser.add_argument("--results", default=RESULTS_PATH, help="JSON-lines file the results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="report without storing the results")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    names = [n.strip() for n in args.only.split(",") if n.strip()]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    with FixtureServer(pages=args.pages) as server:
+        print(f"🧪 Serving fixtures on {server.base_url} ({args.pages} pages per listing)")
+        for name in names:
+            runs = []
+            for _ in range(args.repeat):
+                print(f"⏳ Running {name}...")
+                runs.append(run_benchmark(name, server, args.timeout))
+                if "error" in runs[-1]:
+                    break
+            runs.sort(key=lambda r: r.get("elapsed_sec", 0))
+            results[name] = runs[len(runs) // 2]
+
+    previous = load_previous(args.results, args.pages)
+    print_report(results, previous)
+    if not args.no_save:
+        record = {"timestamp": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+                  "python": sys.version.split()[0], "pages": args.pages, "repeat": args.repeat, "results": results}
+        with open(args.results, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"💾 Results appended to '{args.results}'.")
+
+
+if __name__ == "__main__":
+    main()
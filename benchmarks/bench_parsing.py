@@ -0,0 +1,126 @@
+"""
+Micro-benchmark for gigography JSON-LD parsing.
+
+    python -m benchmarks.bench_parsing --record https://www.songkick.com/artists/123-name --pages saved_pages/
+    python -m benchmarks.bench_parsing --pages saved_pages/
+
+Every parser backend is timed over the saved pages and its output is checked
+against the original BeautifulSoup implementation of scrape_all_past_events.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+import parsing
+from fetching import fetch
+from songkick import parse_past_events
+
+
+# The gigography parse as it was before the parsing layer, kept as the reference output
+def reference_parse(html, artist_url):
+    soup = BeautifulSoup(html, 'html.parser')
+    events = []
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string)
+            for event in (data if isinstance(data, list) else [data]):
+                if event.get('@type') == 'MusicEvent':
+                    location = event.get('location', {})
+                    address = location.get('address', {})
+                    events.append({
+                        'date': event.get('startDate', 'N/A'),
+                        'venue': location.get('name', 'N/A'),
+                        'venue_address': address.get('streetAddress', 'N/A'),
+                        'venue_city': address.get('addressLocality', 'N/A'),
+                        'venue_region': address.get('addressRegion', 'N/A'),
+                        'venue_country': address.get('addressCountry', 'N/A'),
+                        'venue_postal': address.get('postalCode', 'N/A'),
+                        'city': address.get('addressLocality', 'N/A'),
+                        'url': event.get('url', artist_url),
+                        'type': 'Past'
+                    })
+        except (json.JSONDecodeError, TypeError):
+            continue
+    return events
+
+
+def record_pages(artist_url, pages_dir, max_pages=50):
+    os.makedirs(pages_dir, exist_ok=True)
+    with open(os.path.join(pages_dir, "artist_url.txt"), "w", encoding="utf-8") as f:
+        f.write(artist_url)
+    base_url = artist_url.rstrip('/') + "/gigography"
+    for page_num in range(1, max_pages + 1):
+        response = fetch(f"{base_url}?page={page_num}")
+        if response.status_code != 200 or not reference_parse(response.text, artist_url):
+            break
+        with open(os.path.join(pages_dir, f"page_{page_num:03d}.html"), "w", encoding="utf-8") as f:
+            f.write(response.text)
+        time.sleep(0.3)
+    print(f"💾 Saved {page_num - 1} gigography pages to {pages_dir}")
+
+
+def load_pages(pages_dir):
+    url_file = os.path.join(pages_dir, "artist_url.txt")
+    artist_url = open(url_file, encoding="utf-8").read().strip() if os.path.exists(url_file) else "https://www.songkick.com/artists/0"
+    paths = sorted(glob.glob(os.path.join(pages_dir, "*.html")), key=lambda p: int(re.sub(r"\D", "", os.path.basename(p)) or 0))
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return artist_url, pages
+
+
+def crawl_output(parse, pages, artist_url):
+    # Same stopping rule as scrape_all_past_events: the first empty page ends the crawl
+    events = []
+    for html in pages:
+        page_events = parse(html, artist_url)
+        if not page_events:
+            break
+        events.extend(page_events)
+    return events
+
+
+def time_parser(parse, pages, artist_url, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html, artist_url)
+    elapsed = time.perf_counter() - start
+    return len(pages) * repeat / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", required=True, help="directory of saved gigography pages")
+    parser.add_argument("--record", metavar="ARTIST_URL", help="download the artist's gigography into --pages first")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record_pages(args.record, args.pages)
+
+    artist_url, pages = load_pages(args.pages)
+    if not pages:
+        raise SystemExit(f"No .html pages found in {args.pages}")
+
+    expected = crawl_output(reference_parse, pages, artist_url)
+    baseline = time_parser(reference_parse, pages, artist_url, args.repeat)
+    print(f"📄 {len(pages)} pages, {len(expected)} events")
+    print(f"{'backend':<12}{'pages/sec':>12}{'speedup':>10}  identical")
+    print(f"{'reference':<12}{baseline:>12.1f}{1.0:>9.1f}x  -")
+
+    for name in parsing.BACKENDS:
+        parsing.set_backend(name)
+        identical = crawl_output(parse_past_events, pages, artist_url) == expected
+        rate = time_parser(parse_past_events, pages, artist_url, args.repeat)
+        print(f"{name:<12}{rate:>12.1f}{rate / baseline:>9.1f}x  {'✅' if identical else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark for similar-artist scoring on synthetic candidates.
+
+    python -m benchmarks.bench_similarity --candidates 50000 --k 25
+
+Times building the candidate matrix and ranking it against a seed, next to
+the per-artist threshold filter it replaced, so no Spotify access is needed.
+"""
+import argparse
+import random
+import time
+
+from similarity import CandidateMatrix
+
+GENRES = [f"genre {i}" for i in range(1500)]
+
+
+def synthetic_artist(i, rng):
+    followers = int(10 ** rng.uniform(2, 7.5))
+    return {
+        "id": f"artist{i}",
+        "name": f"Artist {i}",
+        "followers": {"total": followers},
+        "popularity": rng.randint(0, 100),
+        "genres": rng.sample(GENRES, rng.randint(0, 6)),
+    }
+
+
+def synthetic_audio(rng):
+    return {"Avg Popularity": round(rng.uniform(0, 100), 2), "Avg Explicitness": round(rng.random(), 2)}
+
+
+# The hard-threshold filter from get_custom_similar_artists before scoring, kept as the baseline
+def threshold_filter(seed, seed_audio, candidates, audio_by_id):
+    kept = []
+    for artist in candidates:
+        followers = artist["followers"]["total"]
+        if not (0.2 * seed["followers"]["total"] <= followers <= 2.5 * seed["followers"]["total"]):
+            continue
+        if abs(artist["popularity"] - seed["popularity"]) > 25:
+            continue
+        audio = audio_by_id[artist["id"]]
+        if abs(audio["Avg Popularity"] - seed_audio["Avg Popularity"]) > 25:
+            continue
+        if abs(audio["Avg Explicitness"] - seed_audio["Avg Explicitness"]) > 0.3:
+            continue
+        kept.append(artist)
+    return kept
+
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7, help="random seed for the synthetic data")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seed = synthetic_artist("seed", rng)
+    seed_audio = synthetic_audio(rng)
+    candidates = [synthetic_artist(i, rng) for i in range(args.candidates)]
+    audio_by_id = {a["id"]: synthetic_audio(rng) for a in candidates}
+
+    build_ms, matrix = best_of(args.repeat, lambda: CandidateMatrix(candidates, audio_by_id))
+    rank_ms, top = best_of(args.repeat, lambda: matrix.top_k(seed, args.k, seed_audio))
+    filter_ms, kept = best_of(args.repeat, lambda: threshold_filter(seed, seed_audio, candidates, audio_by_id))
+
+    print(f"🎯 {len(candidates)} candidates, {len(matrix.genre_ids)} genres")
+    print(f"{'step':<22}{'ms':>10}")
+    print(f"{'build matrix':<22}{build_ms:>10.2f}")
+    print(f"{'score + top-' + str(args.k):<22}{rank_ms:>10.2f}")
+    print(f"{'threshold filter':<22}{filter_ms:>10.2f}  ({len(kept)} kept, unranked)")
+    print("🏆 " + ", ".join(f"{artist['name']} {score:.2f}" for artist, score in top[:5]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import asyncio
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+from metrics import metrics
+
+
+class BrowserPool:
+    """
+    Keeps one Chromium warm and lends out up to `size` context/page pairs.
+    A context is closed and replaced after `max_uses` pages, or straight away
+    if the page that used it raised. Pages can be lent with a RequestFilter
+    routing their requests; it is swapped when the next borrower wants another.
+    """
+
+    def __init__(self, size=2, max_uses=25, headless=True, launch_args=None, context_options=None,
+                 request_filter=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.launch_args = launch_args or []
+        self.context_options = context_options or {}
+        self.request_filter = request_filter
+        self._playwright = None
+        self._browser = None
+        self._idle = []
+        self._slots = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._browser is None:
+                with metrics.timer("browser_start"):
+                    self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(headless=self.headless,
+                                                                           args=self.launch_args)
+                self._slots = asyncio.Semaphore(self.size)
+        return self
+
+    async def close(self):
+        for context, _, _, _ in self._idle:
+            await context.close()
+        self._idle.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            await self._playwright.stop()
+        self._browser = None
+        self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _new_slot(self):
+        with metrics.timer("browser_context"):
+            context = await self._browser.new_context(**self.context_options)
+            page = await context.new_page()
+        return context, page, 0, None
+
+    @asynccontextmanager
+    async def page(self, request_filter=None):
+        await self.start()
+        request_filter = request_filter or self.request_filter
+        async with self._slots:
+            context, page, uses, routed = self._idle.pop() if self._idle else await self._new_slot()
+            if routed is not request_filter:
+                if routed is not None:
+                    await page.unroute("**/*", routed.handle)
+                if request_filter is not None:
+                    await page.route("**/*", request_filter.handle)
+            healthy = False
+            try:
+                yield page
+                healthy = True
+            finally:
+                uses += 1
+                if healthy and uses < self.max_uses and not page.is_closed():
+                    self._idle.append((context, page, uses, request_filter))
+                else:
+                    await context.close()
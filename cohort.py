@@ -0,0 +1,134 @@
+import sqlite3
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from dedup import city_keys
+
+# Every cohort query runs against `cohort_events`, whichever backing store is used
+COHORT_EVENTS = """
+CREATE OR REPLACE {kind} cohort_events AS
+SELECT artist, lower(artist) AS artist_key, event_date AS date,
+       TRY_CAST(substr(event_date, 1, 4) AS INTEGER) AS year,
+       venue, CAST(venue_city AS VARCHAR) AS venue_city, city_key(venue_city) AS city_key, venue_country, source
+FROM {source}
+"""
+
+SQLITE_EVENTS = """
+SELECT a.name AS artist, s.event_date, s.venue, s.venue_city, s.venue_country, s.sources AS source
+FROM {schema}shows s JOIN {schema}artists a ON a.artist_id = s.artist_id
+"""
+
+
+def _sql_string(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _city_key(cities):
+    # The dedup blocking key, so "San Francisco, CA, US" and "San Francisco" group together
+    return pa.array(city_keys(cities.to_pandas()), pa.string())
+
+
+def connect(db_path="tour_data.db", parquet_path=None):
+    """
+    Open an in-memory DuckDB session over the tour data. With `parquet_path`
+    (a directory of exports or a glob) the raw Parquet events are scanned in
+    place. Otherwise the deduplicated SQLite shows are copied once into a
+    columnar DuckDB table, through the sqlite extension or, if it can't be
+    loaded, through pandas.
+    """
+    con = duckdb.connect()
+    con.create_function("city_key", _city_key, ["VARCHAR"], "VARCHAR", type="arrow")
+    kind = "TABLE"
+    if parquet_path:
+        kind = "VIEW"
+        pattern = parquet_path if parquet_path.endswith(".parquet") else f"{parquet_path.rstrip('/')}/**/*.parquet"
+        source = f"read_parquet({_sql_string(pattern)}, hive_partitioning = true, union_by_name = true)"
+    else:
+        try:
+            con.execute("INSTALL sqlite; LOAD sqlite;")
+            con.execute(f"ATTACH {_sql_string(db_path)} AS tour (TYPE SQLITE, READ_ONLY)")
+            source = f"({SQLITE_EVENTS.format(schema='tour.')})"
+        except duckdb.Error:
+            sqlite_conn = sqlite3.connect(db_path)
+            con.register("sqlite_events", pd.read_sql(SQLITE_EVENTS.format(schema=''), sqlite_conn))
+            sqlite_conn.close()
+            source = "sqlite_events"
+    con.execute(COHORT_EVENTS.format(kind=kind, source=source))
+    return con
+
+
+def _query(con, sql, artists, *params):
+    return con.execute(sql, [[a.lower() for a in artists], *params]).df()
+
+
+def cohort_summary(con, artists):
+    return _query(con, """
+        SELECT artist, COUNT(*) AS shows,
+               COUNT(DISTINCT venue_country) AS countries,
+               COUNT(DISTINCT venue_city) AS cities,
+               MIN(year) AS first_year, MAX(year) AS last_year
+        FROM cohort_events
+        WHERE artist_key IN (SELECT UNNEST(?))
+        GROUP BY artist
+        ORDER BY shows DESC
+    """, artists)
+
+
+def shared_cities(con, artists, min_artists=2, limit=50):
+    # Rows without a country borrow the one most often seen with the same city
+    return _query(con, """
+        WITH scoped AS (
+            SELECT artist, city_key, trim(split_part(venue_city, ',', 1)) AS city_name,
+                   CASE WHEN venue_country NOT IN ('', 'N/A') THEN venue_country END AS country
+            FROM cohort_events
+            WHERE artist_key IN (SELECT UNNEST(?)) AND city_key <> ''
+        ), placed AS (
+            SELECT *, coalesce(country, mode(country) OVER (PARTITION BY city_key)) AS city_country
+            FROM scoped
+        )
+        SELECT mode(city_name) AS city, city_country AS country,
+               COUNT(DISTINCT artist) AS artists, COUNT(*) AS shows,
+               string_agg(DISTINCT artist, ', ') AS artist_names
+        FROM placed
+        GROUP BY city_key, city_country
+        HAVING COUNT(DISTINCT artist) >= ?
+        ORDER BY artists DESC, shows DESC
+        LIMIT ?
+    """, artists, min_artists, limit)
+
+
+def shared_countries(con, artists):
+    return _query(con, """
+        SELECT venue_country AS country, COUNT(DISTINCT artist) AS artists, COUNT(*) AS shows
+        FROM cohort_events
+        WHERE artist_key IN (SELECT UNNEST(?)) AND venue_country NOT IN ('', 'N/A')
+        GROUP BY venue_country
+        ORDER BY artists DESC, shows DESC
+    """, artists)
+
+
+def artist_country_matrix(con, artists, top_countries=20):
+    long = _query(con, """
+        WITH scoped AS (
+            SELECT * FROM cohort_events
+            WHERE artist_key IN (SELECT UNNEST(?)) AND venue_country NOT IN ('', 'N/A')
+        ), top AS (
+            SELECT venue_country FROM scoped GROUP BY venue_country ORDER BY COUNT(*) DESC LIMIT ?
+        )
+        SELECT artist, venue_country AS country, COUNT(*) AS shows
+        FROM scoped JOIN top USING (venue_country)
+        GROUP BY artist, venue_country
+    """, artists, top_countries)
+    return long.pivot_table(index="artist", columns="country", values="shows", fill_value=0)
+
+
+def shows_by_year(con, artists):
+    return _query(con, """
+        SELECT year, artist, COUNT(*) AS shows
+        FROM cohort_events
+        WHERE artist_key IN (SELECT UNNEST(?)) AND year IS NOT NULL
+        GROUP BY year, artist
+        ORDER BY year
+    """, artists)
@@ -1,220 +1,486 @@
-import requests, time, json, re, sqlite3, pandas as pd, asyncio
+import os, time, json, asyncio, argparse, itertools
 from bs4 import BeautifulSoup
 from datetime import datetime
 from urllib.parse import quote
-from playwright.async_api import async_playwright
+from browser_pool import BrowserPool
+from residentadvisor import ra_slug, stream_ra_events, request_filter as ra_request_filter
+from concertarchives import concert_url, slugify, stream_band_pages, request_filter as ca_request_filter
+import fetching
+from metrics import metrics
+from parsing import json_ld_blocks
+from parquet_export import PARQUET_DIR
+from gazetteer import configure_gazetteer
+from pipeline import EventSink
+from storage import connect, crawl_complete, known_event_urls
+from fetching import (HostLimiter, IncompleteCrawl, collect_pages, configure_cache, crawl_pages, fetch, retry_policy,
+                      stream_pages)
 
 # -------------------- SONGKICK --------------------
-headers = {"User-Agent": "Mozilla/5.0"}
+# Base URLs are overridable so the benchmark can point the scrapers at a local server
+SONGKICK_BASE_URL = os.getenv("SONGKICK_BASE_URL", "https://www.songkick.com")
 
 def find_songkick_artist_url(artist_name):
-    search_url = f"https://www.songkick.com/search?query={artist_name.replace(' ', '+')}"
-    response = requests.get(search_url, headers=headers)
+    search_url = f"{SONGKICK_BASE_URL}/search?query={artist_name.replace(' ', '+')}"
+    response = fetch(search_url)
     if response.status_code != 200:
-        return None, f"Search failed: {response.status_code}"
+        # Still failing after retries: not the same as the artist having no history
+        raise IncompleteCrawl(f"Songkick search failed with HTTP {response.status_code}")
     soup = BeautifulSoup(response.text, 'html.parser')
     for link in soup.select('li a[href^="/artists/"]'):
         if artist_name.lower() in link.text.strip().lower():
-            return "https://www.songkick.com" + link['href'], None
+            return SONGKICK_BASE_URL + link['href'], None
     return None, f"Artist '{artist_name}' not found on Songkick"
 
 def scrape_events_from_page(url, section_name):
-    response = requests.get(url, headers=headers)
+    response = fetch(url)
     if response.status_code != 200:
         return [], f"Failed to fetch {section_name} page: {response.status_code}"
-    soup = BeautifulSoup(response.text, 'html.parser')
-    events = []
-    for li in soup.select('li.concert'):
-        date = li.select_one('.date strong')
-        venue = li.select_one('.location .venue-name')
-        city = li.select_one('.location .location')
-        link = li.select_one('a.event-link')
-        if date and venue and city and link:
-            events.append({
-                'date': date.text.strip(),
-                'venue': venue.text.strip(),
-                'venue_address': 'N/A',
-                'venue_city': city.text.strip(),
-                'venue_region': 'N/A',
-                'venue_country': 'N/A',
-                'venue_postal': 'N/A',
-                'city': city.text.strip(),
-                'url': "https://www.songkick.com" + link['href'],
-                'type': section_name,
-                'source': 'Songkick'
-            })
+    with metrics.timer("parse", "Songkick"):
+        soup = BeautifulSoup(response.text, 'html.parser')
+        events = []
+        for li in soup.select('li.concert'):
+            date = li.select_one('.date strong')
+            venue = li.select_one('.location .venue-name')
+            city = li.select_one('.location .location')
+            link = li.select_one('a.event-link')
+            if date and venue and city and link:
+                events.append({
+                    'date': date.text.strip(),
+                    'venue': venue.text.strip(),
+                    'venue_address': 'N/A',
+                    'venue_city': city.text.strip(),
+                    'venue_region': 'N/A',
+                    'venue_country': 'N/A',
+                    'venue_postal': 'N/A',
+                    'city': city.text.strip(),
+                    'url': SONGKICK_BASE_URL + link['href'],
+                    'type': section_name,
+                    'source': 'Songkick'
+                })
+    metrics.count("parse_items", "Songkick", len(events))
     return events, None
 
-def scrape_all_past_events(artist_url, max_pages=50):
-    all_events = []
+@metrics.timed("parse", "Songkick")
+def parse_past_events(html, artist_url):
+    events = []
+    for block in json_ld_blocks(html):
+        try:
+            data = json.loads(block)
+            items = data if isinstance(data, list) else [data]
+            for event in items:
+                if event.get('@type') == 'MusicEvent':
+                    location = event.get('location', {})
+                    address = location.get('address', {})
+                    events.append({
+                        'date': event.get('startDate', 'N/A'),
+                        'venue': location.get('name', 'N/A'),
+                        'venue_address': address.get('streetAddress', 'N/A'),
+                        'venue_city': address.get('addressLocality', 'N/A'),
+                        'venue_region': address.get('addressRegion', 'N/A'),
+                        'venue_country': address.get('addressCountry', 'N/A'),
+                        'venue_postal': address.get('postalCode', 'N/A'),
+                        'city': address.get('addressLocality', 'N/A'),
+                        'url': event.get('url', artist_url),
+                        'type': 'Past',
+                        'source': 'Songkick'
+                    })
+        except:
+            continue
+    return events
+
+def iter_past_events(artist_url, max_pages=50, known_urls=None):
+    """
+    Yield the gigography one page of events at a time. With `known_urls` only unseen
+    events are yielded and paging stops on the first page that reaches a stored event.
+    A page that still fails after retries raises IncompleteCrawl.
+    """
+    known_urls = set(known_urls or ()) - {artist_url}
     base_url = artist_url.rstrip('/') + "/gigography"
     for page_num in range(1, max_pages + 1):
-        paged_url = f"{base_url}?page={page_num}"
-        response = requests.get(paged_url, headers=headers)
+        page_url = f"{base_url}?page={page_num}"
+        response = fetch(page_url)
         if response.status_code != 200:
+            raise IncompleteCrawl(f"gigography page {page_num} failed with HTTP {response.status_code}")
+        events = parse_past_events(response.text, artist_url)
+        if not events:
             break
-        soup = BeautifulSoup(response.text, 'html.parser')
-        scripts = soup.find_all("script", type="application/ld+json")
-        found_event_on_page = False
-        for script in scripts:
-            try:
-                data = json.loads(script.string)
-                events = data if isinstance(data, list) else [data]
-                for event in events:
-                    if event.get('@type') == 'MusicEvent':
-                        location = event.get('location', {})
-                        address = location.get('address', {})
-                        all_events.append({
-                            'date': event.get('startDate', 'N/A'),
-                            'venue': location.get('name', 'N/A'),
-                            'venue_address': address.get('streetAddress', 'N/A'),
-                            'venue_city': address.get('addressLocality', 'N/A'),
-                            'venue_region': address.get('addressRegion', 'N/A'),
-                            'venue_country': address.get('addressCountry', 'N/A'),
-                            'venue_postal': address.get('postalCode', 'N/A'),
-                            'city': address.get('addressLocality', 'N/A'),
-                            'url': event.get('url', artist_url),
-                            'type': 'Past',
-                            'source': 'Songkick'
-                        })
-                        found_event_on_page = True
-            except:
-                continue
-        if not found_event_on_page:
+        yield [e for e in events if e['url'] not in known_urls]
+        if any(e['url'] in known_urls for e in events):
             break
-        time.sleep(0.3)
-    return all_events
+        if not response.from_cache:
+            time.sleep(retry_policy.pace(page_url))
+
+def scrape_all_past_events(artist_url, max_pages=50):
+    return collect_pages(iter_past_events(artist_url, max_pages))
+
+def scrape_new_past_events(artist_url, known_urls, max_pages=50):
+    return collect_pages(iter_past_events(artist_url, max_pages, known_urls))
 
-def get_songkick_data(artist_name):
+def _gigography_pages(artist_url, limiter):
+    base_url = artist_url.rstrip('/') + "/gigography"
+    return (lambda page_num: f"{base_url}?page={page_num}",
+            lambda html: parse_past_events(html, artist_url),
+            limiter)
+
+async def scrape_all_past_events_async(artist_url, max_pages=50, max_per_host=4, rate_per_host=3.0, limiter=None):
+    limiter = limiter or HostLimiter(max_per_host, rate_per_host)
+    return await crawl_pages(*_gigography_pages(artist_url, limiter), max_pages=max_pages,
+                             concurrency=limiter.max_per_host)
+
+async def stream_past_events_async(artist_url, max_pages=50, max_per_host=4, rate_per_host=3.0, limiter=None):
+    limiter = limiter or HostLimiter(max_per_host, rate_per_host)
+    async for events in stream_pages(*_gigography_pages(artist_url, limiter), max_pages=max_pages,
+                                     concurrency=limiter.max_per_host):
+        yield events
+
+async def _iterate_in_thread(iterator):
+    # Drive a blocking generator from the event loop one item at a time
+    while (item := await asyncio.to_thread(next, iterator, None)) is not None:
+        yield item
+
+def iter_songkick_data(artist_name, known_urls=None, on_upcoming_error=None):
+    """
+    Yield an artist's Songkick events in batches: upcoming shows, then each
+    gigography page. Raises IncompleteCrawl at the end if any part failed; if
+    the upcoming page failed, `on_upcoming_error()` is called before the first
+    batch so the caller can keep the upcoming shows it already has.
+    """
     artist_url, error = find_songkick_artist_url(artist_name)
     if error:
         print(f"⚠️ {artist_name}: {error}")
-        return []
+        return
     print(f"🔗 Found artist page: {artist_url}")
     print("🎟️ Scraping all concert data for your chosen artist...")
-    upcoming, _ = scrape_events_from_page(artist_url, "Upcoming")
-    past = scrape_all_past_events(artist_url)
-    events = upcoming + past
-    for e in events:
-        e["artist"] = artist_name
+    upcoming, upcoming_error = scrape_events_from_page(artist_url, "Upcoming")
+    if upcoming_error and on_upcoming_error:
+        on_upcoming_error()
+    for events in itertools.chain([upcoming], iter_past_events(artist_url, known_urls=known_urls)):
+        for e in events:
+            e["artist"] = artist_name
+        yield events
+    if upcoming_error:
+        raise IncompleteCrawl(upcoming_error)
+
+def get_songkick_data(artist_name, concurrent=False, known_urls=None):
+    if concurrent and not known_urls:
+        try:
+            artist_url, error = find_songkick_artist_url(artist_name)
+        except IncompleteCrawl as e:
+            error = e
+        if error:
+            print(f"⚠️ {artist_name}: {error}")
+            return []
+        upcoming, _ = scrape_events_from_page(artist_url, "Upcoming")
+        events = upcoming + asyncio.run(scrape_all_past_events_async(artist_url))
+        for e in events:
+            e["artist"] = artist_name
+    else:
+        events = collect_pages(iter_songkick_data(artist_name, known_urls))
     print(f"✅ Songkick: Scraped {len(events)} total events.")
     return events
 
+async def stream_songkick_data_async(artist_name, limiter=None, known_urls=None, on_upcoming_error=None):
+    """Async counterpart of iter_songkick_data for batch runs; gigography pages go through `limiter`."""
+    artist_url, error = await asyncio.to_thread(find_songkick_artist_url, artist_name)
+    if error:
+        print(f"⚠️ {artist_name}: {error}")
+        return
+    upcoming, upcoming_error = await asyncio.to_thread(scrape_events_from_page, artist_url, "Upcoming")
+    if upcoming_error and on_upcoming_error:
+        on_upcoming_error()
+    if known_urls:
+        pages = _iterate_in_thread(iter_past_events(artist_url, known_urls=known_urls))
+    else:
+        pages = stream_past_events_async(artist_url, limiter=limiter)
+    for e in upcoming:
+        e["artist"] = artist_name
+    yield upcoming
+    async for events in pages:
+        for e in events:
+            e["artist"] = artist_name
+        yield events
+    if upcoming_error:
+        raise IncompleteCrawl(upcoming_error)
+
+async def get_songkick_data_async(artist_name, limiter=None, known_urls=None):
+    events = []
+    try:
+        async for batch in stream_songkick_data_async(artist_name, limiter, known_urls):
+            events.extend(batch)
+    except IncompleteCrawl as e:
+        print(f"⚠️ Incomplete crawl: {e}")
+    print(f"✅ Songkick: Scraped {len(events)} total events for {artist_name}.")
+    return events
+
 # -------------------- CONCERT ARCHIVES --------------------
-def slugify(name: str) -> str:
-    return name.lower().replace("&", "and").replace(".", "").replace(",", "").replace("'", "").replace("\"", "").replace("(", "").replace(")", "").replace("–", "-").replace("—", "-").replace(" ", "-")
-
-def build_url(slug: str, page: int = 1) -> str:
-    return f"https://www.concertarchives.org/bands/{slug}" + (f"?page={page}#concert-table" if page > 1 else "")
-
-async def scrape_concert_archives(artist_name):
-    slug = slugify(artist_name)
-    all_shows = []
-    current_page = 1
-    while True:
-        url = build_url(slug, current_page)
-        success = await scrape_page(url, all_shows, slug)
-        if not success:
-            print("🚫 No data found or error occurred.")
-            break
-        print(f"🎯 Concert Archives: {len(all_shows)} shows scraped so far.")
-        more = input("➕ Scrape more Concert Archives pages? (y/n): ").strip().lower()
-        if more != 'y':
-            break
-        current_page += 1
-    if all_shows:
-        unique = list({tuple(sorted(show.items())) for show in all_shows})
-        return [dict(show) | {"artist": artist_name, "type": "Past", "source": "Concert Archives"} for show in unique]
-    return []
-
-async def scrape_page(url: str, shows: list, slug: str):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
-        try:
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+async def stream_concert_archives(artist_name, pool, max_pages=20, concurrency=None):
+    """Yield an artist's Concert Archives shows page by page, dropping rows already yielded."""
+    seen = set()
+    async for rows in stream_band_pages(slugify(artist_name), pool, max_pages=max_pages, concurrency=concurrency):
+        shows = [{
+            "date": row["date"].strip(),
+            "venue": row["venue"].strip(),
+            "venue_address": "N/A",
+            "venue_city": row["location"].strip(),
+            "venue_region": "N/A",
+            "venue_country": "N/A",
+            "venue_postal": "N/A",
+            "city": row["location"].strip(),
+            "url": concert_url(row)
+        } for row in rows]
+        fresh = []
+        for show in shows:
+            key = tuple(sorted(show.items()))
+            if key not in seen:
+                seen.add(key)
+                fresh.append(show | {"artist": artist_name, "type": "Past", "source": "Concert Archives"})
+        yield fresh
+
+async def scrape_concert_archives(artist_name, max_pages=20, pool=None):
+    if pool is None:
+        async with BrowserPool() as pool:
+            return await scrape_concert_archives(artist_name, max_pages, pool)
+    shows = []
+    try:
+        async for batch in stream_concert_archives(artist_name, pool, max_pages):
+            shows.extend(batch)
+    except IncompleteCrawl as e:
+        print(f"⚠️ Incomplete crawl: {e}")
+    print(f"🎯 Concert Archives: {len(shows)} shows scraped for {artist_name}.")
+    return shows
+
+# -------------------- BATCH --------------------
+SOURCES = ("songkick", "concert_archives", "resident_advisor")
+DEFAULT_SOURCES = ("songkick", "concert_archives")
+SOURCE_LIMITS = {"songkick": 4, "concert_archives": 2, "resident_advisor": 1}
+SOURCE_NAMES = {"songkick": "Songkick", "concert_archives": "Concert Archives", "resident_advisor": "Resident Advisor"}
+
+def read_artist_names(path):
+    with open(path, encoding="utf-8") as f:
+        names = [line.strip() for line in f]
+    return [name for name in names if name and not name.startswith("#")]
+
+async def scrape_artist(artist_name, sources, semaphores, songkick_limiter, browser_pool, sink, ca_max_pages=20,
+                        known_urls=None, ca_concurrency=None):
+    """Stream every source's pages for one artist into `sink`; returns the number of events written."""
+    streams = {
+        "songkick": lambda: stream_songkick_data_async(
+            artist_name, limiter=songkick_limiter, known_urls=known_urls,
+            on_upcoming_error=lambda: sink.keep_upcoming(artist_name, "Songkick")),
+        "concert_archives": lambda: stream_concert_archives(artist_name, browser_pool, max_pages=ca_max_pages,
+                                                            concurrency=ca_concurrency),
+        "resident_advisor": lambda: stream_ra_events(artist_name, browser_pool, slug=ra_slug(artist_name)),
+    }
+
+    async def drain(source):
+        # Events written before a crawl is cut short are kept; the crawl is recorded as incomplete
+        count = 0
+        async with semaphores[source]:
             try:
-                await page.wait_for_selector("table tbody tr", timeout=30000)
-            except:
-                print("⏳ Table rows not found in time. Waiting fallback 5s...")
-                await page.wait_for_timeout(5000)
-        except Exception as e:
-            print(f"❌ Failed to load page or data: {e}")
-            await browser.close()
-            return False
-        try:
-            rows = await page.query_selector_all("table tbody tr")
-            for row in rows:
-                try:
-                    date = await (await row.query_selector("td:nth-child(1) span")).inner_text()
-                    artist = await (await row.query_selector("td:nth-child(2) a")).inner_text()
-                    venue = await (await row.query_selector("td:nth-child(3) a")).inner_text()
-                    location = await (await row.query_selector("td:nth-child(4) a")).inner_text()
-                    href = await (await row.query_selector("td:nth-child(2) a")).get_attribute("href")
-                    shows.append({
-                        "date": date.strip(),
-                        "venue": venue.strip(),
-                        "venue_address": "N/A",
-                        "venue_city": location.strip(),
-                        "venue_region": "N/A",
-                        "venue_country": "N/A",
-                        "venue_postal": "N/A",
-                        "city": location.strip(),
-                        "url": f"https://www.concertarchives.org{href}" if href else ""
-                    })
-                except:
-                    continue
-        except:
-            print(f"⚠️ Error parsing concert data.")
-        await browser.close()
-        return True
+                async for events in streams[source]():
+                    sink.write(events)
+                    count += len(events)
+            except IncompleteCrawl as e:
+                print(f"⚠️ {source} crawl for {artist_name} cut short after {count} events: {e}")
+                sink.record_crawl(artist_name, SOURCE_NAMES[source], complete=False, reason=str(e))
+                return count
+            except Exception as e:
+                # Any other failure (a browser error, say) leaves the history just as incomplete
+                sink.record_crawl(artist_name, SOURCE_NAMES[source], complete=False, reason=f"{type(e).__name__}: {e}")
+                raise
+        # Stored once the events above are flushed, never ahead of them
+        sink.record_crawl(artist_name, SOURCE_NAMES[source], complete=True)
+        return count
+
+    results = await asyncio.gather(*(drain(source) for source in sources), return_exceptions=True)
+
+    total = 0
+    for source, result in zip(sources, results):
+        if isinstance(result, Exception):
+            print(f"❌ {source} failed for {artist_name}: {result}")
+            continue
+        print(f"✅ {source}: {result} events for {artist_name}.")
+        total += result
+    return total
+
+async def run_batch(artist_names, sources=DEFAULT_SOURCES, workers=8, source_limits=None,
+                    db_path="tour_data.db", csv_filename=None, ca_max_pages=20, incremental=False,
+                    parquet_dir=PARQUET_DIR, batch_size=1000, prom_path=None):
+    """
+    Scrape every artist without prompting. Each source has its own concurrency
+    limit, and pages stream into one EventSink that writes every `batch_size`
+    events to SQLite, Parquet and the CSV in one go, so memory stays bounded by
+    the batch and an interrupted run keeps every batch flushed so far.
+    Run metrics go to metrics_<run>.json, and to `prom_path` in Prometheus format.
+    """
+    unknown = set(sources) - set(SOURCES)
+    if unknown:
+        raise ValueError(f"Unknown sources: {', '.join(sorted(unknown))}")
+
+    limits = SOURCE_LIMITS | (source_limits or {})
+    semaphores = {source: asyncio.Semaphore(limits[source]) for source in SOURCES}
+    songkick_limiter = HostLimiter(max_per_host=limits["songkick"])
+    # One warm Chromium for the whole run; it only launches if a browser source is used
+    browser_pool = BrowserPool(size=limits["concert_archives"] + limits["resident_advisor"])
+    run_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    csv_filename = csv_filename or f"all_tour_data_{run_stamp}.csv"
+
+    metrics.reset()
+
+    queue = asyncio.Queue()
+    for name in artist_names:
+        queue.put_nowait(name)
+
+    conn = connect(db_path)
+    sink = EventSink(conn, parquet_dir=parquet_dir, csv_path=csv_filename, batch_size=batch_size, run_stamp=run_stamp)
+    totals = {"artists": 0, "events": 0}
+
+    async def worker():
+        while True:
+            try:
+                artist_name = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            print(f"\n🔍 Fetching {', '.join(sources)} data for: {artist_name}")
+            # An incremental crawl stops at the first stored event, so it can't fill a gap a cut-short crawl left
+            known_urls = (known_event_urls(conn, artist_name)
+                          if incremental and crawl_complete(conn, artist_name) else None)
+            found = await scrape_artist(artist_name, sources, semaphores, songkick_limiter, browser_pool, sink,
+                                        ca_max_pages, known_urls, limits["concert_archives"])
+            if not found:
+                print(f"❌ No events found for {artist_name}.")
+                continue
+            totals["artists"] += 1
+            totals["events"] += found
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(workers, len(artist_names)) or 1)))
+    finally:
+        sink.close()
+        conn.close()
+        await browser_pool.close()
+
+    if sink.stats["events"]:
+        print(f"📁 Combined CSV saved as '{csv_filename}' with {sink.stats['events']} total events "
+              f"({sink.stats['new_rows']} new in the events table).")
+    else:
+        print("⚠️ No data to save to CSV.")
+    if "concert_archives" in sources:
+        print(f"🚫 Concert Archives request filter: {ca_request_filter.summary()}")
+    if "resident_advisor" in sources:
+        print(f"🚫 Resident Advisor request filter: {ra_request_filter.summary()}")
+    metrics.write_run(run_stamp, prom_path)
+    return totals
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape tour data from Songkick, Concert Archives and Resident Advisor.")
+    parser.add_argument("--batch", metavar="FILE", help="file with one artist name per line; runs without prompts")
+    parser.add_argument("--similar-to", metavar="ARTIST", help="batch over the seed artist and its Spotify similar artists")
+    parser.add_argument("--graph-hops", type=int, default=0,
+                        help="with --similar-to, walk this many related-artist hops instead of one filtered pass")
+    parser.add_argument("--graph-budget", type=int, default=500, help="Spotify API calls the --graph-hops walk may spend")
+    parser.add_argument("--sources", default=",".join(DEFAULT_SOURCES), help=f"comma-separated subset of: {', '.join(SOURCES)}")
+    parser.add_argument("--workers", type=int, default=8, help="artists scraped at the same time")
+    parser.add_argument("--songkick-limit", type=int, default=SOURCE_LIMITS["songkick"])
+    parser.add_argument("--concert-archives-limit", type=int, default=SOURCE_LIMITS["concert_archives"])
+    parser.add_argument("--resident-advisor-limit", type=int, default=SOURCE_LIMITS["resident_advisor"])
+    parser.add_argument("--ca-max-pages", type=int, default=20, help="stop Concert Archives paging after this many pages")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch gigography pages newer than what is stored and upsert the new rows")
+    parser.add_argument("--cache-dir", help="cache HTTP responses on disk and revalidate them on later runs")
+    parser.add_argument("--offline", action="store_true", help="re-parse from the HTTP cache without any network requests")
+    parser.add_argument("--db", default="tour_data.db")
+    parser.add_argument("--parquet-dir", default=PARQUET_DIR, help="partitioned Parquet output; pass '' to skip")
+    parser.add_argument("--batch-size", type=int, default=1000, help="events buffered before each write to storage")
+    parser.add_argument("--gazetteer", metavar="CITIES_FILE",
+                        help="GeoNames cities dump for filling missing countries and coordinates (default: $GAZETTEER_PATH)")
+    parser.add_argument("--metrics-prom", metavar="FILE",
+                        help="also write run metrics in Prometheus text format (default: $METRICS_TEXTFILE)")
+    return parser.parse_args()
 
 # -------------------- MAIN --------------------
-if __name__ == "__main__":
-    conn = sqlite3.connect("tour_data.db")
-    all_dfs = []
+async def _stream_concert_archives_into(sink, artist_name):
+    found = 0
+    async with BrowserPool() as pool:
+        try:
+            async for shows in stream_concert_archives(artist_name, pool):
+                sink.write(shows)
+                found += len(shows)
+        except IncompleteCrawl as e:
+            print(f"⚠️ {artist_name}: Concert Archives crawl cut short after {found} events ({e})")
+    return found
 
-    while True:
-        artist_name = input("🎤 Enter artist name (or type 'done' to finish): ").strip()
-        if artist_name.lower() == 'done':
-            break
+def interactive_main(parquet_dir=PARQUET_DIR, batch_size=1000, prom_path=None):
+    conn = connect("tour_data.db")
+    run_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_filename = f"all_tour_data_{run_stamp}.csv"
+    sink = EventSink(conn, parquet_dir=parquet_dir, csv_path=csv_filename, batch_size=batch_size, run_stamp=run_stamp)
 
-        print(f"\n🔍 Fetching Songkick data for: {artist_name}")
-        events = get_songkick_data(artist_name)
+    with sink:
+        while True:
+            artist_name = input("🎤 Enter artist name (or type 'done' to finish): ").strip()
+            if artist_name.lower() == 'done':
+                break
 
-        ca_prompt = input("🎫 Would you also like concert archives for this artist? (y/n): ").strip().lower()
-        if ca_prompt == 'y':
-            print("⏳ Loading Concert Archives data...")
-            ca_data = asyncio.run(scrape_concert_archives(artist_name))
-            events.extend(ca_data)
+            print(f"\n🔍 Fetching Songkick data for: {artist_name}")
+            found = 0
+            try:
+                for events in iter_songkick_data(artist_name,
+                                                 on_upcoming_error=lambda: sink.keep_upcoming(artist_name, "Songkick")):
+                    sink.write(events)
+                    found += len(events)
+                sink.record_crawl(artist_name, "Songkick", complete=True)
+            except IncompleteCrawl as e:
+                print(f"⚠️ {artist_name}: Songkick crawl cut short and marked incomplete ({e})")
+                sink.record_crawl(artist_name, "Songkick", complete=False, reason=str(e))
 
-        if not events:
-            print(f"❌ No events found for {artist_name}.")
-            continue
+            ca_prompt = input("🎫 Would you also like concert archives for this artist? (y/n): ").strip().lower()
+            if ca_prompt == 'y':
+                print("⏳ Loading Concert Archives data...")
+                found += asyncio.run(_stream_concert_archives_into(sink, artist_name))
 
-        df = pd.DataFrame(events, columns=[
-            "artist", "type", "date", "venue", "venue_address", "venue_city",
-            "venue_region", "venue_country", "venue_postal", "city", "url", "source"
-        ])
-        df = df.drop_duplicates()
+            if not found:
+                print(f"❌ No events found for {artist_name}.")
+                continue
 
-        table_name = re.sub(r'\W+', '_', artist_name.lower())
-        df.to_sql(table_name, conn, if_exists="replace", index=False)
-        print(f"✅ Saved {len(df)} events to table '{table_name}' in database.")
-        all_dfs.append(df)
-        time.sleep(0.5)
+            # Don't leave a finished artist buffered while waiting at the prompt
+            sink.flush()
+            time.sleep(0.5)
 
     conn.close()
 
-    if all_dfs:
-        combined_df = pd.concat(all_dfs, ignore_index=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_filename = f"all_tour_data_{timestamp}.csv"
-        combined_df.to_csv(csv_filename, index=False)
-        print(f"📁 Combined CSV saved as '{csv_filename}' with {len(combined_df)} total events.")
+    if sink.stats["events"]:
+        print(f"📁 Combined CSV saved as '{csv_filename}' with {sink.stats['events']} total events "
+              f"({sink.stats['new_rows']} new in the events table).")
     else:
         print("⚠️ No data to save to CSV.")
+    metrics.write_run(run_stamp, prom_path)
 
     print("🏁 Done. All artist data saved.")
 
+if __name__ == "__main__":
+    args = parse_args()
+    if args.cache_dir or args.offline:
+        configure_cache(args.cache_dir or ".http_cache", offline=args.offline)
+    configure_gazetteer(args.gazetteer)
+    if args.batch or args.similar_to:
+        if args.batch:
+            artist_names = read_artist_names(args.batch)
+        elif args.graph_hops:
+            from artist_graph import expand_graph
+            artist_names = expand_graph([args.similar_to], max_hops=args.graph_hops,
+                                        budget=args.graph_budget).ranked_names()
+        else:
+            from similar_artists import find_similar_artist_names
+            artist_names = find_similar_artist_names(args.similar_to)
+        sources = [s.strip() for s in args.sources.split(",") if s.strip()]
+        limits = {"songkick": args.songkick_limit, "concert_archives": args.concert_archives_limit,
+                  "resident_advisor": args.resident_advisor_limit}
+        asyncio.run(run_batch(artist_names, sources, workers=args.workers, source_limits=limits,
+                              db_path=args.db, ca_max_pages=args.ca_max_pages, incremental=args.incremental,
+                              parquet_dir=args.parquet_dir, batch_size=args.batch_size, prom_path=args.metrics_prom))
+        if fetching.cache is not None:
+            print(f"🗄️ HTTP cache: {fetching.cache.stats}")
+        print("🏁 Done. All artist data saved.")
+    else:
+        interactive_main(args.parquet_dir, args.batch_size, args.metrics_prom)
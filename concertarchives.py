@@ -1,7 +1,13 @@
 import asyncio
 import csv
+import os
+import time
+from datetime import datetime
 from urllib.parse import quote
-from playwright.async_api import async_playwright
+from browser_pool import BrowserPool
+from fetching import IncompleteCrawl, stream_until_empty
+from request_filter import make_filter
+from metrics import metrics, record_navigation
 
 # Convert artist name to a URL-friendly slug
 def slugify(name: str) -> str:
@@ -19,9 +25,12 @@ def slugify(name: str) -> str:
         .replace(" ", "-")
     )
 
+# bench.py swaps this for its local fixture server
+CONCERT_ARCHIVES_BASE_URL = os.getenv("CONCERT_ARCHIVES_BASE_URL", "https://www.concertarchives.org")
+
 # Build URL for a given artist and page number
 def build_url(slug: str, page: int = 1) -> str:
-    base = f"https://www.concertarchives.org/bands/{slug}"
+    base = f"{CONCERT_ARCHIVES_BASE_URL}/bands/{slug}"
     return base if page == 1 else f"{base}?page={page}#concert-table"
 
 # Save data to CSV
@@ -32,70 +41,102 @@ def save_to_csv(filename: str, data: list):
         writer.writerows(data)
     print(f"✅ Saved to CSV: {filename}")
 
-# Scrape one page of concert data
-async def scrape_page(url: str, shows: list):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=True,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--start-maximized"
-            ]
-        )
-        context = await browser.new_context(
-            viewport={"width": 1280, "height": 800},
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121 Safari/537.36"
-        )
-        page = await context.new_page()
-
-        print("🌐 Scraping concerts...")
+# Browser settings shared by every page in the pool
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--start-maximized"
+]
+CONTEXT_OPTIONS = {
+    "viewport": {"width": 1280, "height": 800},
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121 Safari/537.36"
+}
+
+# Only the server-rendered table is read, so images, fonts and trackers are never fetched
+request_filter = make_filter("concert_archives")
+
+def make_pool(size=2, max_uses=25):
+    return BrowserPool(size=size, max_uses=max_uses, launch_args=LAUNCH_ARGS, context_options=CONTEXT_OPTIONS,
+                       request_filter=request_filter)
+
+# Pull every row's cells in one evaluation instead of several CDP round-trips per row
+EXTRACT_ROWS_JS = """
+rows => rows.map(row => {
+    const date = row.querySelector("td:nth-child(1) span");
+    const artist = row.querySelector("td:nth-child(2) a");
+    const venue = row.querySelector("td:nth-child(3) a");
+    const location = row.querySelector("td:nth-child(4) a");
+    if (!(date && artist && venue && location)) return null;
+    return {
+        date: date.innerText,
+        artist: artist.innerText,
+        venue: venue.innerText,
+        location: location.innerText,
+        href: artist.getAttribute("href")
+    };
+}).filter(Boolean)
+"""
+
+# A page past the end of the history still has the table, just no rows. The table is
+# server-rendered, so it is normally there by DOMContentLoaded; a page without it never loaded properly.
+TABLE_TIMEOUT_MS = 5000
+
+# Load one page and return its raw rows; an empty list is the normal end of the history
+async def scrape_rows(url: str, pool: BrowserPool) -> list:
+    async with pool.page(request_filter=request_filter) as page:
+        print(f"🌐 Scraping concerts: {url}")
         try:
-            await page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            await page.wait_for_selector("table tbody tr", timeout=15000)
+            started = time.perf_counter()
+            response = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+            await record_navigation("Concert Archives", response, started)
         except Exception as e:
-            print(f"❌ Failed to load page or data: {e}")
-            await browser.close()
-            return False
+            # Never let a failed load pass for an empty last page
+            raise IncompleteCrawl(f"failed to load {url}: {str(e).splitlines()[0]}") from e
+        # Only a 404 or a rendered table with no rows is the end; a challenge page or any other error is not
+        if response is not None and response.status == 404:
+            return []
+        if response is not None and response.status != 200:
+            raise IncompleteCrawl(f"{url} failed with HTTP {response.status}")
 
-        print("📄 Parsing concert data...")
-        found_data = False
         try:
-            rows = await page.query_selector_all("table tbody tr")
-            if not rows:
-                print("⚠️ No concerts found on this page.")
-            else:
-                found_data = True
-                for row in rows:
-                    try:
-                        date_el = await row.query_selector("td:nth-child(1) span")
-                        artist_el = await row.query_selector("td:nth-child(2) a")
-                        venue_el = await row.query_selector("td:nth-child(3) a")
-                        location_el = await row.query_selector("td:nth-child(4) a")
-
-                        if not all([date_el, artist_el, venue_el, location_el]):
-                            continue
-
-                        date = await date_el.inner_text()
-                        artist = await artist_el.inner_text()
-                        venue = await venue_el.inner_text()
-                        location = await location_el.inner_text()
-                        concert_href = await artist_el.get_attribute("href")
-                        concert_url = f"https://www.concertarchives.org{concert_href}" if concert_href else ""
-
-                        shows.append({
-                            "Date": date.strip(),
-                            "Artist/Show Name": artist.strip(),
-                            "Venue": venue.strip(),
-                            "Location": location.strip(),
-                            "Concert URL": concert_url
-                        })
-                    except Exception as e:
-                        print("⚠️ Skipping row due to issue:", e)
+            await page.wait_for_selector("table", state="attached", timeout=TABLE_TIMEOUT_MS)
         except Exception as e:
-            print(f"⚠️ Error parsing data: {e}")
-
-        await browser.close()
-        return found_data
+            raise IncompleteCrawl(f"no concert table on {url} after {TABLE_TIMEOUT_MS / 1000:g}s") from e
+        try:
+            with metrics.timer("parse", "Concert Archives"):
+                rows = await page.eval_on_selector_all("table tbody tr", EXTRACT_ROWS_JS)
+        except Exception as e:
+            raise IncompleteCrawl(f"failed to read rows on {url}: {str(e).splitlines()[0]}") from e
+    metrics.count("parse_items", "Concert Archives", len(rows))
+    return rows
+
+def concert_url(row: dict) -> str:
+    return f"{CONCERT_ARCHIVES_BASE_URL}{row['href']}" if row["href"] else ""
+
+# Yield each page's rows in page order, scraping several pages at once, until a page has no rows.
+# Raises IncompleteCrawl after the last good page if a page fails.
+async def stream_band_pages(slug: str, pool: BrowserPool, max_pages: int = 50, concurrency: int = None):
+    async def scrape_numbered_page(page_num):
+        return await scrape_rows(build_url(slug, page_num), pool)
+
+    async for rows in stream_until_empty(scrape_numbered_page, max_pages=max_pages,
+                                         concurrency=concurrency or pool.size):
+        yield rows
+
+# Scrape every page into CSV rows; a crawl cut short keeps the pages before the failure
+async def scrape_all_pages(slug: str, pool: BrowserPool, max_pages: int = 50):
+    shows = []
+    try:
+        async for rows in stream_band_pages(slug, pool, max_pages):
+            shows.extend({
+                "Date": row["date"].strip(),
+                "Artist/Show Name": row["artist"].strip(),
+                "Venue": row["venue"].strip(),
+                "Location": row["location"].strip(),
+                "Concert URL": concert_url(row)
+            } for row in rows)
+    except IncompleteCrawl as e:
+        print(f"⚠️ Incomplete crawl: {e}")
+    return shows
 
 # Main flow
 async def main():
@@ -103,23 +144,12 @@ async def main():
     slug = slugify(artist_name)
     name_base = slug.replace("-", "_")
     csv_filename = f"{name_base}.csv"
-    all_shows = []
-    current_page = 1
 
-    while True:
-        url = build_url(slug, current_page)
-        success = await scrape_page(url, all_shows)
-
-        if not success:
-            print("🚫 Stopping — no data on this page or an error occurred.")
-            break
-
-        print(f"🎯 Shows scraped so far: {len(all_shows)}")
-        another = input("➕ Scrape more? (y/n): ").strip().lower()
-        if another != 'y':
-            break
-
-        current_page += 1
+    async with make_pool(size=4) as pool:
+        all_shows = await scrape_all_pages(slug, pool)
+    print(f"🎯 Shows scraped: {len(all_shows)}")
+    print(f"🚫 Request filter: {request_filter.summary()}")
+    metrics.write_run(datetime.now().strftime("%Y%m%d_%H%M%S"))
 
     if all_shows:
         # 🧼 Remove duplicates
@@ -134,5 +164,5 @@ async def main():
         print("🚫 No concert data was scraped.")
 
 # Run it
-asyncio.run(main())
-
+if __name__ == "__main__":
+    asyncio.run(main())
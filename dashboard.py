@@ -1,52 +1,131 @@
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import sqlite3
+import aggregates
+import cohort
+from storage import connect, list_artists, load_artist_events
 
 DB_PATH = "tour_data.db"
 
-@st.cache_data
-def get_artist_tables(db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    raw_tables = [row[0] for row in cursor.fetchall()]
+def db_version(db_path):
+    # Writes land in the WAL file first, so either file changing means new data
+    return max((os.path.getmtime(path) for path in (db_path, f"{db_path}-wal") if os.path.exists(path)), default=0)
+
+@st.cache_data(max_entries=1)
+def get_artists(db_path, version):
+    conn = connect(db_path)
+    artists = list_artists(conn)
     conn.close()
-    excluded = {"tour_data", "finish"}
-    return {t.replace("_", " ").title(): t for t in raw_tables if t.lower() not in excluded}
+    return dict(zip(artists['name'], artists['artist_id']))
 
 @st.cache_data
-def load_data(table_name, db_path, artist_name):
-    conn = sqlite3.connect(db_path)
-    df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
+def load_rollups(artist_id, db_path):
+    conn = connect(db_path)
+    rollups = aggregates.load_rollups(conn, artist_id)
+    conn.close()
+    for table in rollups.values():
+        table['venue_country'] = table['venue_country'].fillna("N/A")
+    return rollups
+
+@st.cache_data(max_entries=32)
+def export_csv(artist_id, db_path, artist_name, years, countries):
+    # Only runs when the download button is clicked, once per artist and filter combination
+    conn = connect(db_path)
+    df = load_artist_events(conn, artist_id)
     conn.close()
     df['artist'] = artist_name
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df = df.dropna(subset=['date'])
-    df['year'] = df['date'].dt.year
-    df['month'] = df['date'].dt.month
-    df['month_name'] = df['date'].dt.strftime('%b')
-    df['weekday'] = df['date'].dt.day_name()
-    return df
+    # Dates were normalized at ingest; the year is a slice of the canonical string
+    df['year'] = pd.to_numeric(df['event_date'].str[:4])
+    df['venue_country'] = df['venue_country'].fillna("N/A")
+    return df[df['year'].isin(years) & df['venue_country'].isin(countries)].to_csv(index=False)
+
+@st.cache_resource(max_entries=1)
+def get_cohort_connection(db_path, version):
+    # Keyed on the database's version so newly scraped artists show up without a restart
+    return cohort.connect(db_path)
+
+def apply_filters(table, years, countries):
+    return table[table['year'].isin(years) & table['venue_country'].isin(countries)]
+
+def top_counts(table, column, n=None):
+    counts = table.groupby(column)['shows'].sum().sort_values(ascending=False)
+    counts = counts.head(n) if n else counts
+    return counts.reset_index()
 
 # === Streamlit Config ===
 st.set_page_config(page_title="Touring Dashboard", layout="wide")
 st.title("🎧 JORA Touring Dashboard")
 
 # === Sidebar: Artist Selection ===
-artist_table_map = get_artist_tables(DB_PATH)
+artist_map = get_artists(DB_PATH, db_version(DB_PATH))
+if not artist_map:
+    st.warning("No artists in the database yet. Run a scraper or `python storage.py` to migrate old tables.")
+    st.stop()
+view_mode = st.sidebar.radio("View", ["Single Artist", "Cohort"], horizontal=True)
+
+# === Cohort View ===
+if view_mode == "Cohort":
+    st.sidebar.markdown("### 👥 Build a Cohort")
+    cohort_artists = st.sidebar.multiselect("Artists", sorted(artist_map.keys()))
+    pasted = st.sidebar.text_area("Or paste names (one per line), e.g. from find_similar_artist_names")
+    cohort_artists = list(dict.fromkeys(cohort_artists + [n.strip() for n in pasted.splitlines() if n.strip()]))
+    min_artists = st.sidebar.slider("Shared by at least N artists", 1, max(2, len(cohort_artists)), 2)
+
+    if not cohort_artists:
+        st.info("Select or paste artists to compare.")
+        st.stop()
+
+    con = get_cohort_connection(DB_PATH, db_version(DB_PATH)).cursor()
+    summary = cohort.cohort_summary(con, cohort_artists)
+    st.header(f"Cohort Overview ({len(summary)} of {len(cohort_artists)} artists found)")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Shows", int(summary['shows'].sum()))
+    col2.metric("Median Shows/Artist", int(summary['shows'].median()) if not summary.empty else 0)
+    col3.metric("Countries Covered", len(cohort.shared_countries(con, cohort_artists)))
+    st.dataframe(summary, use_container_width=True)
+
+    st.subheader("🏙️ Shared Cities")
+    cities = cohort.shared_cities(con, cohort_artists, min_artists=min_artists)
+    col_table, col_chart = st.columns([2, 2])
+    with col_table:
+        st.dataframe(cities, use_container_width=True, height=400)
+    with col_chart:
+        fig = px.bar(cities.head(15).sort_values(by='artists'), x='artists', y='city', orientation='h',
+                     hover_data=['country', 'shows'], title="Cities Played by the Most Cohort Artists")
+        st.plotly_chart(fig, use_container_width=True)
+    if not cities.empty:
+        st.markdown(f"**Insight:** **{cities.iloc[0]['city']}** is shared by **{cities.iloc[0]['artists']}** artists in this cohort.")
+
+    st.subheader("🌍 Cohort Reach by Country")
+    countries_df = cohort.shared_countries(con, cohort_artists)
+    fig = px.choropleth(countries_df, locations='country', locationmode='country names', color='artists',
+                        hover_data=['shows'], color_continuous_scale="plasma", title="Artists Touring Each Country")
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("🗺️ Artist × Country")
+    matrix = cohort.artist_country_matrix(con, cohort_artists)
+    if not matrix.empty:
+        fig = px.imshow(matrix, labels=dict(x="Country", y="Artist", color="Shows"), color_continuous_scale="Blues")
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("📊 Shows per Year")
+    fig = px.line(cohort.shows_by_year(con, cohort_artists), x='year', y='shows', color='artist')
+    st.plotly_chart(fig, use_container_width=True)
+    st.stop()
+
 st.sidebar.markdown("### 🎤 Select an Artist")
-selected_display_name = st.sidebar.selectbox("Search or Select Artist", sorted(list(artist_table_map.keys())))
-selected_table = artist_table_map[selected_display_name]
-df = load_data(selected_table, DB_PATH, selected_display_name)
+selected_display_name = st.sidebar.selectbox("Search or Select Artist", sorted(artist_map.keys()))
+selected_artist_id = int(artist_map[selected_display_name])
+rollups = load_rollups(selected_artist_id, DB_PATH)
 
-if df.empty:
+if rollups['agg_country'].empty:
     st.warning("No data found for this artist.")
     st.stop()
 
 # === Filter by Year (Checkbox style) ===
 st.sidebar.markdown("### 📅 Filter by Year")
-years = sorted(df['year'].dropna().unique())
+years = sorted(rollups['agg_country']['year'].unique())
 select_all_years = st.sidebar.checkbox("Select All Years", value=True)
 if select_all_years:
     selected_years = years
@@ -55,35 +134,41 @@ else:
 
 # === Filter by Country (Checkbox style) ===
 st.sidebar.markdown("### 🌍 Filter by Country")
-countries = sorted(df['venue_country'].dropna().unique())
+countries = sorted(rollups['agg_country']['venue_country'].unique())
 select_all_countries = st.sidebar.checkbox("Select All Countries", value=True)
 if select_all_countries:
     selected_countries = countries
 else:
     selected_countries = st.sidebar.multiselect("Choose Country(ies)", options=countries, default=countries)
 
-# === Filter Data ===
-df = df[df['year'].isin(selected_years) & df['venue_country'].isin(selected_countries)]
+# === Filter Rollups ===
+by_country = apply_filters(rollups['agg_country'], selected_years, selected_countries)
+by_city = apply_filters(rollups['agg_city'], selected_years, selected_countries)
+by_venue = apply_filters(rollups['agg_venue'], selected_years, selected_countries)
+by_month = apply_filters(rollups['agg_month'], selected_years, selected_countries)
+by_weekday = apply_filters(rollups['agg_weekday'], selected_years, selected_countries)
+total_shows = int(by_country['shows'].sum())
+year_counts = by_country.groupby('year')['shows'].sum()
 
 # === Overview Metrics ===
-st.info(f"✅ Loaded {len(df)} filtered shows for {selected_display_name}")
+st.info(f"✅ Loaded {total_shows} filtered shows for {selected_display_name}")
 
 st.header(f"Touring Overview for {selected_display_name}")
 col1, col2, col3, col4, col5, col6 = st.columns(6)
-col1.metric("Total Shows", len(df))
-col2.metric("Unique Cities", df['venue_city'].nunique())
-col3.metric("Countries Played", df['venue_country'].nunique())
-col4.metric("Active Years", df['year'].nunique())
-if df['year'].nunique() > 0:
-    col5.metric("Avg Shows/Year", round(len(df) / df['year'].nunique(), 1))
-if not df.empty:
-    top_year = df['year'].value_counts().idxmax()
-    top_count = df['year'].value_counts().max()
+col1.metric("Total Shows", total_shows)
+col2.metric("Unique Cities", by_city['venue_city'].nunique())
+col3.metric("Countries Played", by_country.loc[by_country['venue_country'] != "N/A", 'venue_country'].nunique())
+col4.metric("Active Years", len(year_counts))
+if len(year_counts) > 0:
+    col5.metric("Avg Shows/Year", round(total_shows / len(year_counts), 1))
+if total_shows:
+    top_year = year_counts.idxmax()
+    top_count = year_counts.max()
     col6.metric("Most Active Year", f"{top_year} ({top_count})")
     
 # === Shows by Country ===
 st.subheader("🌍 Shows by Country")
-country_df = df['venue_country'].value_counts().reset_index()
+country_df = top_counts(by_country, 'venue_country')
 country_df.columns = ['country', 'count']
 col_table, col_map = st.columns([1.5, 2.5])
 
@@ -103,7 +188,7 @@ st.subheader("🏙️ Top Cities and Venues")
 col1, col2 = st.columns(2)
 
 with col1:
-    top_cities = df['venue_city'].value_counts().head(10).reset_index()
+    top_cities = top_counts(by_city, 'venue_city', 10)
     top_cities.columns = ['venue_city', 'count']
     fig = px.bar(top_cities.sort_values(by='count'), x='count', y='venue_city', orientation='h',
                  labels={'venue_city': 'City', 'count': 'Shows'}, title="Top Cities", text='count')
@@ -112,7 +197,7 @@ with col1:
         st.markdown(f"**Insight:** Top city: **{top_cities.iloc[0]['venue_city']}** with **{top_cities.iloc[0]['count']}** shows.")
 
 with col2:
-    top_venues = df['venue'].value_counts().head(10).reset_index()
+    top_venues = top_counts(by_venue, 'venue', 10)
     top_venues.columns = ['venue', 'count']
     fig = px.bar(top_venues.sort_values(by='count'), x='count', y='venue', orientation='h',
                  labels={'venue': 'Venue', 'count': 'Shows'}, title="Top Venues", text='count')
@@ -123,7 +208,7 @@ with col2:
 
 # === Shows by Year ===
 st.subheader("📊 Shows by Year")
-year_df = df['year'].value_counts().sort_index().reset_index()
+year_df = year_counts.sort_index().reset_index()
 year_df.columns = ['Year', 'Count']
 fig = px.bar(year_df, x='Year', y='Count', title="Total Shows Per Year", text='Count')
 st.plotly_chart(fig, use_container_width=True)
@@ -132,49 +217,53 @@ if not year_df.empty:
     
 # === Cumulative Growth ===
 st.subheader("📈 Cumulative Growth Over Time")
-df_sorted = df.sort_values("date")
-df_sorted['cumulative'] = range(1, len(df_sorted) + 1)
-fig = px.line(df_sorted, x='date', y='cumulative', title="Growth in Total Shows Over Time")
+month_totals = by_month.groupby(['year', 'month'])['shows'].sum().reset_index()
+month_totals['date'] = pd.to_datetime(dict(year=month_totals['year'], month=month_totals['month'], day=1))
+month_totals = month_totals.sort_values('date')
+month_totals['cumulative'] = month_totals['shows'].cumsum()
+fig = px.line(month_totals, x='date', y='cumulative', title="Growth in Total Shows Over Time")
 st.plotly_chart(fig, use_container_width=True)
-if not df_sorted.empty:
-    growth_year = df_sorted['year'].mode().iloc[0]
+if not month_totals.empty:
+    growth_year = year_counts.idxmax()
     st.markdown(f"**Insight:** Major touring growth occurred in **{growth_year}**.")
     
 # === Calendar Heatmap ===
 st.subheader("📆 Shows by Year & Month")
-heatmap = df.pivot_table(index='month_name', columns='year', values='venue', aggfunc='count').fillna(0)
+month_totals['month_name'] = month_totals['date'].dt.strftime('%b')
+heatmap = month_totals.pivot_table(index='month_name', columns='year', values='shows', aggfunc='sum').fillna(0)
 fig = px.imshow(heatmap, labels=dict(x="Year", y="Month", color="Show Count"),
                 color_continuous_scale="Blues", x=heatmap.columns, y=heatmap.index)
 st.plotly_chart(fig, use_container_width=True)
-if not df.empty:
-    top_month = df['month_name'].mode().iloc[0]
+month_counts = month_totals.groupby('month_name')['shows'].sum().sort_values(ascending=False)
+if not month_counts.empty:
+    top_month = month_counts.index[0]
     st.markdown(f"**Insight:** Touring peaks in **{top_month}**, aligning with seasonal demand.")
 
 
 # === Monthly Spread ===
 st.subheader("📦 Touring Spread by Month")
-fig = px.box(df, x='month_name', y='year', points="all", title="Touring Seasonality")
+fig = px.scatter(month_totals, x='month_name', y='year', size='shows', title="Touring Seasonality",
+                 category_orders={'month_name': ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                                 "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]})
 st.plotly_chart(fig, use_container_width=True)
-if not df.empty:
-    peak_months = df['month_name'].value_counts().head(2).index.tolist()
+if len(month_counts) > 1:
+    peak_months = month_counts.head(2).index.tolist()
     st.markdown(f"**Insight:** Key months for touring: **{peak_months[0]}** and **{peak_months[1]}**.")
 
 # === Shows by Weekday ===
 st.subheader("📅 Shows by Day of the Week")
-weekday_df = df['weekday'].value_counts().reindex([
-    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"
-]).reset_index()
+weekday_df = by_weekday.groupby('weekday')['shows'].sum().reindex(aggregates.WEEKDAYS).reset_index()
 weekday_df.columns = ['Weekday', 'Count']
 fig = px.bar(weekday_df, x='Weekday', y='Count', title="Shows by Weekday", text='Count')
 st.plotly_chart(fig, use_container_width=True)
-if not weekday_df.empty:
+if weekday_df['Count'].notna().any():
     busiest_day = weekday_df.loc[weekday_df['Count'].idxmax(), 'Weekday']
     st.markdown(f"**Insight:** Most shows happen on **{busiest_day}**, aligning with audience availability.")
 
 
 # === CSV Export (Styled Button) ===
-csv_data = df.copy()
-csv_data['artist'] = selected_display_name
+# Only the export needs individual events; they are read through the (artist_id, date) index on click, not per rerun
+export_filters = (tuple(int(y) for y in selected_years), tuple(selected_countries))
 
 st.markdown(f"""
 <style>
@@ -192,9 +281,10 @@ st.markdown(f"""
 
 st.download_button(
     label=f"⬇️ Download {selected_display_name} Tour Data",
-    data=csv_data.to_csv(index=False),
+    data=lambda: export_csv(selected_artist_id, DB_PATH, selected_display_name, *export_filters),
     file_name=f"{selected_display_name.replace(' ', '_')}_tour_data.csv",
-    mime="text/csv"
+    mime="text/csv",
+    on_click="ignore"
 )
 
 st.caption("Built with ❤️ using Streamlit, Plotly, and SQLite — Empowering data-driven music tours.")
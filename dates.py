@@ -0,0 +1,84 @@
+import pandas as pd
+
+# Tried in order on whatever is still unparsed; the ISO prefix check runs first for every source.
+# Formats without a year (Songkick's upcoming "Jun 18") get one inferred from the event type.
+SOURCE_FORMATS = {
+    "Songkick": ["%b %d", "%a %d %b", "%d %B %Y", "%A %d %B %Y", "%b %d, %Y"],
+    "Concert Archives": ["%b %d, %Y", "%B %d, %Y", "%m/%d/%Y", "%d %b %Y", "%d %B %Y"],
+    "Resident Advisor": ["%a, %d %b %Y", "%a, %d %b", "%d %b %Y", "%d %B %Y", "%d %b"],
+    "EDMTrain": ["%A, %B %d, %Y", "%a, %b %d, %Y", "%B %d, %Y", "%b %d"],
+}
+ALL_FORMATS = list(dict.fromkeys(fmt for formats in SOURCE_FORMATS.values() for fmt in formats))
+
+ISO_DATE_RE = r"^(\d{4}-\d{2}-\d{2})"
+LEAP_YEAR = 2000
+
+
+def _clean(raw):
+    raw = raw.astype("string").str.strip()
+    raw = raw.str.replace(r"\s+", " ", regex=True)
+    return raw.str.replace(r"(\d)(st|nd|rd|th)\b", r"\1", regex=True)
+
+
+def parse_dates(raw, formats=ALL_FORMATS, reference=None, upcoming=None):
+    """
+    Vectorized parse of a Series of date strings into datetime64, NaT where
+    nothing matched. Each format runs once over the rows still unparsed.
+    Yearless dates take the next occurrence on or after `reference` where
+    `upcoming` is true and the last one on or before it elsewhere.
+    """
+    reference = pd.Timestamp(reference or pd.Timestamp.now()).normalize()
+    raw = _clean(raw)
+    parsed = pd.to_datetime(raw.str.extract(ISO_DATE_RE, expand=False), format="%Y-%m-%d", errors="coerce")
+
+    for fmt in formats:
+        missing = parsed.isna() & raw.notna()
+        if not missing.any():
+            break
+        if "%Y" in fmt:
+            parsed[missing] = pd.to_datetime(raw[missing], format=fmt, errors="coerce")
+            continue
+        # Parse against a leap year so "Feb 29" is never rejected, then move it to the right year
+        guess = pd.to_datetime(raw[missing] + f" {LEAP_YEAR}", format=f"{fmt} %Y", errors="coerce")
+        if upcoming is None:
+            forward = pd.Series(False, index=guess.index)
+        else:
+            forward = upcoming[missing].astype(bool)
+        parsed[missing] = _place_year(guess, forward, reference)
+    return parsed
+
+
+def _place_year(guess, forward, reference):
+    # Nearest year on the right side of `reference` that has the month and day; Feb 29 can be up to 8 years off
+    placed = pd.Series(pd.NaT, index=guess.index, dtype="datetime64[ns]")
+    month_day = pd.DataFrame({"month": guess.dt.month, "day": guess.dt.day})
+    step = forward.map({True: 1, False: -1})
+    for offset in range(9):
+        todo = placed.isna() & guess.notna()
+        if not todo.any():
+            break
+        candidate = pd.to_datetime(month_day[todo].assign(year=reference.year + step[todo] * offset), errors="coerce")
+        fits = (candidate >= reference).where(forward[todo], candidate <= reference) & candidate.notna()
+        placed[fits[fits].index] = candidate[fits]
+    return placed
+
+
+def normalize_dates(df, reference=None):
+    """
+    Add the canonical `event_date` column (YYYY-MM-DD, None if unparseable),
+    parsing each source with its own formats. Returns the frame and the rows
+    that failed, so callers can report them instead of silently dropping them.
+    """
+    df = df.copy()
+    parsed = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    sources = df["source"] if "source" in df.columns else pd.Series(None, index=df.index, dtype=object)
+    upcoming = df["type"].eq("Upcoming") if "type" in df.columns else None
+
+    for source, index in sources.fillna("Unknown").groupby(sources.fillna("Unknown")).groups.items():
+        parsed[index] = parse_dates(
+            df.loc[index, "date"], SOURCE_FORMATS.get(source, ALL_FORMATS), reference,
+            None if upcoming is None else upcoming[index]
+        )
+
+    df["event_date"] = parsed.dt.strftime("%Y-%m-%d").astype(object).where(parsed.notna(), None)
+    return df, df[parsed.isna()]
@@ -0,0 +1,130 @@
+import json
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+import pandas as pd
+
+# Fields of a merged show; each one is taken from the first source, in this
+# order, that has a real value for it, and that source is recorded.
+SOURCE_PRIORITY = ["Songkick", "Resident Advisor", "EDMTrain", "Concert Archives"]
+MERGED_FIELDS = [
+    "type", "venue", "venue_address", "venue_city", "venue_region",
+    "venue_country", "venue_postal", "city", "url", "latitude", "longitude"
+]
+MISSING = {"", "N/A", "n/a", "TBA"}
+VENUE_STOPWORDS = {"the", "club", "venue", "hall", "arena", "theatre", "theater"}
+VENUE_THRESHOLD = 0.85
+
+
+def _normalize(values):
+    values = values.astype("string").where(~values.isin(MISSING))
+    values = values.str.normalize("NFKD").str.encode("ascii", "ignore").str.decode("ascii").str.lower()
+    values = values.str.replace("&", " and ", regex=False).str.replace(r"[^a-z0-9]+", " ", regex=True)
+    return values.str.strip().fillna("")
+
+
+def city_keys(cities):
+    # "London, England, United Kingdom" and "London" block together
+    return _normalize(cities.astype("string").str.split(",").str[0])
+
+
+def venue_keys(venues):
+    words = _normalize(venues).str.split()
+    return words.map(lambda w: " ".join(t for t in w if t not in VENUE_STOPWORDS) or " ".join(w))
+
+
+@lru_cache(maxsize=65536)
+def _similar(a, b, threshold):
+    # Touring histories revisit the same venues, so the same pairs come up again and again
+    matcher = SequenceMatcher(None, a, b)
+    return (matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold
+            and matcher.ratio() >= threshold)
+
+
+def venues_match(a, b, threshold=VENUE_THRESHOLD):
+    """Missing venues match anything in their block; otherwise token containment or a fuzzy ratio."""
+    if not a or not b or a == b:
+        return True
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    if tokens_a <= tokens_b or tokens_b <= tokens_a:
+        return True
+    return _similar(*sorted((a, b)), threshold)
+
+
+def cluster_events(events, threshold=VENUE_THRESHOLD):
+    """
+    Group one artist's events into shows. Candidates are blocked on
+    (event_date, city) and venues are only compared inside a block, so the
+    work grows with the number of events rather than the number of pairs.
+    Events with no city are compared against every block of their date.
+    Returns lists of row positions.
+    """
+    parent = list(range(len(events)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    cities = city_keys(events["venue_city"].where(events["venue_city"].notna(), events["city"])).tolist()
+    venues = venue_keys(events["venue"]).tolist()
+
+    blocks = {}
+    for position, event_date in enumerate(events["event_date"]):
+        if event_date is not None and not pd.isna(event_date):
+            blocks.setdefault(event_date, {}).setdefault(cities[position], []).append(position)
+
+    for by_city in blocks.values():
+        for city, block in by_city.items():
+            candidates = block if city else [p for positions in by_city.values() for p in positions]
+            for i, a in enumerate(block):
+                for b in (candidates[i + 1:] if city else candidates):
+                    if a != b and find(a) != find(b) and venues_match(venues[a], venues[b], threshold):
+                        parent[find(b)] = find(a)
+
+    clusters = {}
+    for position in range(len(events)):
+        clusters.setdefault(find(position), []).append(position)
+    return list(clusters.values())
+
+
+def merge_records(records):
+    """Merge matched events into one show, recording which source supplied every field."""
+    rank = {source: i for i, source in enumerate(SOURCE_PRIORITY)}
+    records = sorted(records, key=lambda r: rank.get(r["source"], len(rank)))
+    show, provenance = {}, {}
+    for field in MERGED_FIELDS:
+        for record in records:
+            value = record.get(field)
+            if value is not None and not pd.isna(value) and str(value) not in MISSING:
+                show[field], provenance[field] = value, record["source"]
+                break
+        else:
+            show[field] = None
+    show["event_date"] = next((r["event_date"] for r in records if r["event_date"]), None)
+    show["sources"] = ", ".join(dict.fromkeys(r["source"] for r in records))
+    show["provenance"] = json.dumps(provenance)
+    return show
+
+
+def resolve_artist(conn, artist_id, threshold=VENUE_THRESHOLD):
+    """Rebuild one artist's rows in `shows` from its events and link every event to its show."""
+    events = pd.read_sql(
+        f"SELECT event_id, source, event_date, {', '.join(MERGED_FIELDS)} FROM events WHERE artist_id = ?",
+        conn, params=(artist_id,)
+    )
+    records = events.to_dict("records")
+    columns = ["event_date", *MERGED_FIELDS, "sources", "provenance"]
+
+    conn.execute("DELETE FROM shows WHERE artist_id = ?", (artist_id,))
+    links = []
+    for members in cluster_events(events, threshold):
+        show = merge_records([records[p] for p in members])
+        show_id = conn.execute(
+            f"INSERT INTO shows (artist_id, {', '.join(columns)}) VALUES (?, {', '.join('?' for _ in columns)})",
+            (artist_id, *(show[c] for c in columns))
+        ).lastrowid
+        links.extend((show_id, int(records[p]["event_id"])) for p in members)
+    conn.executemany("UPDATE events SET show_id = ? WHERE event_id = ?", links)
+    return len(events) - len(set(show_id for show_id, _ in links))
@@ -1,27 +1,44 @@
-import pandas as pd
-import sqlite3
+import argparse
+import asyncio
 import time
 import re
 from datetime import datetime
 from bs4 import BeautifulSoup
 from urllib.parse import quote_plus
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from browser_pool import BrowserPool
+from request_filter import make_filter
+from metrics import metrics, record_navigation, record_navigation_sync
+from parquet_export import PARQUET_DIR
+from gazetteer import configure_gazetteer
+from pipeline import EventSink
+from storage import connect
+
+TOUR_URL_RE = re.compile(r"^https://edmtrain\.com/tours/[a-z0-9\-]+-\d+$")
+EVENT_SELECTOR = "a.event.callout"
+# Once the page has stopped loading, a tour with shows renders them almost at once
+EMPTY_GRACE_MS = 500
+
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "viewport": {"width": 1280, "height": 800},
+    "locale": "en-US",
+}
+
+request_filter = make_filter("edmtrain")
 
 def get_first_edmtrain_url_from_user():
     artist_url = input("🔗 Enter EDMTrain tour URL (e.g. https://edmtrain.com/tours/artist-name-id): ").strip()
-    if re.match(r"^https://edmtrain\.com/tours/[a-z0-9\-]+-\d+$", artist_url):
+    if TOUR_URL_RE.match(artist_url):
         print(f"✅ Using direct EDMTrain URL: {artist_url}")
         return artist_url
     print("❌ Invalid EDMTrain tour URL format.")
     return None
 
-def get_artist_events(artist_url, artist_name, page):
-    print(f"🌐 Fetching: {artist_url}")
-    page.goto(artist_url, timeout=60000)
-    page.wait_for_timeout(3000)
-    html = page.content()
+@metrics.timed("parse", "EDMTrain")
+def parse_events(html, artist_name, artist_url):
     soup = BeautifulSoup(html, 'html.parser')
-    rows = soup.select("a.event.callout")
+    rows = soup.select(EVENT_SELECTOR)
     print(f"🔍 Found {len(rows)} events for {artist_name}")
 
     events = []
@@ -44,24 +61,133 @@ def get_artist_events(artist_url, artist_name, page):
                 "date": date.strip(),
                 "venue": venue,
                 "venue_city": city,
-                "url": artist_url
+                "url": artist_url,
+                "source": "EDMTrain"
             })
         except Exception as e:
             print(f"⚠️ Failed to parse event: {e}")
     return events
 
+def get_artist_events(artist_url, artist_name, page, timeout=15000):
+    print(f"🌐 Fetching: {artist_url}")
+    started = time.perf_counter()
+    response = page.goto(artist_url, timeout=60000)
+    record_navigation_sync("EDMTrain", response, started)
+    # A tour page with no shows never renders the list, so stop once the page goes quiet instead of the full timeout
+    try:
+        page.wait_for_load_state("networkidle", timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+    try:
+        page.wait_for_selector(EVENT_SELECTOR, timeout=EMPTY_GRACE_MS)
+    except PlaywrightTimeoutError:
+        pass
+    return parse_events(page.content(), artist_name, artist_url)
+
+async def wait_for_events(page, timeout):
+    """Return as soon as the event list renders, or shortly after the page goes quiet without one (no shows)."""
+    rendered = asyncio.ensure_future(page.wait_for_selector(EVENT_SELECTOR, timeout=timeout))
+    idle = asyncio.ensure_future(page.wait_for_load_state("networkidle", timeout=timeout))
+    try:
+        await asyncio.wait({rendered, idle}, return_when=asyncio.FIRST_COMPLETED)
+        if not rendered.done():
+            await asyncio.wait({rendered}, timeout=EMPTY_GRACE_MS / 1000)
+    finally:
+        for waiter in (rendered, idle):
+            if waiter.done():
+                waiter.exception()  # a timed-out wait just means no events; don't log it as unretrieved
+            else:
+                waiter.cancel()
+
+async def get_artist_events_async(artist_url, artist_name, pool, timeout=15000):
+    async with pool.page(request_filter=request_filter) as page:
+        print(f"🌐 Fetching: {artist_url}")
+        started = time.perf_counter()
+        response = await page.goto(artist_url, timeout=60000)
+        await record_navigation("EDMTrain", response, started)
+        await wait_for_events(page, timeout)
+        html = await page.content()
+    return parse_events(html, artist_name, artist_url)
+
+# -------------------- BATCH --------------------
+def read_url_pairs(path):
+    """Read "artist, tour URL" lines (comma or tab separated); blank lines and # comments are skipped."""
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = re.split(r"\s*[,\t]\s*(?=https?://)", line, maxsplit=1)
+            if len(parts) != 2 or not TOUR_URL_RE.match(parts[1]):
+                print(f"⚠️ Skipping line {line_num}: expected 'artist, https://edmtrain.com/tours/...'")
+                continue
+            pairs.append((parts[0], parts[1]))
+    return pairs
+
+async def run_batch(pairs, pages=4, db_path="edmtrain_google_scraped.db", csv_filename=None,
+                    parquet_dir=PARQUET_DIR, batch_size=1000, timeout=15000, prom_path=None):
+    """Scrape every (artist, URL) pair on `pages` parallel pages of one browser, streaming events into storage."""
+    metrics.reset()
+    run_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_filename = csv_filename or f"edmtrain_google_scraped_{run_stamp}.csv"
+    queue = asyncio.Queue()
+    for pair in pairs:
+        queue.put_nowait(pair)
+
+    conn = connect(db_path)
+    sink = EventSink(conn, parquet_dir=parquet_dir, csv_path=csv_filename, batch_size=batch_size, run_stamp=run_stamp)
+
+    async def worker(pool):
+        while True:
+            try:
+                artist_name, artist_url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                events = await get_artist_events_async(artist_url, artist_name, pool, timeout)
+            except Exception as e:
+                print(f"❌ {artist_name}: {e}")
+                continue
+            if not events:
+                print(f"⚠️ No events found for {artist_name}")
+            sink.write(events)
+
+    try:
+        async with BrowserPool(size=pages, context_options=CONTEXT_OPTIONS) as pool:
+            await asyncio.gather(*(worker(pool) for _ in range(min(pages, len(pairs)) or 1)))
+    finally:
+        sink.close()
+        conn.close()
+
+    print(f"📁 Combined CSV saved as: {csv_filename} ({sink.stats['events']} events, "
+          f"{sink.stats['new_rows']} new rows in the events table)")
+    print(f"🚫 Request filter: {request_filter.summary()}")
+    metrics.write_run(run_stamp, prom_path)
+    return sink.stats
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape EDMTrain tour pages.")
+    parser.add_argument("--batch", metavar="FILE", help="file of 'artist, tour URL' lines; runs without prompts")
+    parser.add_argument("--pages", type=int, default=4, help="tour pages scraped in parallel")
+    parser.add_argument("--timeout", type=int, default=15000, help="ms to wait for the event list to render")
+    parser.add_argument("--db", default="edmtrain_google_scraped.db")
+    parser.add_argument("--batch-size", type=int, default=1000, help="events buffered before each write to storage")
+    parser.add_argument("--metrics-prom", metavar="FILE",
+                        help="also write run metrics in Prometheus text format (default: $METRICS_TEXTFILE)")
+    return parser.parse_args()
+
 # 🏁 MAIN
-if __name__ == "__main__":
-    conn = sqlite3.connect("edmtrain_google_scraped.db")
-    all_dfs = []
+def interactive_main(db_path="edmtrain_google_scraped.db", timeout=15000, prom_path=None):
+    conn = connect(db_path)
+    run_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_filename = f"edmtrain_google_scraped_{run_stamp}.csv"
+    sink = EventSink(conn, parquet_dir=PARQUET_DIR, csv_path=csv_filename, run_stamp=run_stamp)
 
-    with sync_playwright() as p:
+    with sync_playwright() as p, sink:
         browser = p.chromium.launch(headless=True)
-        page = browser.new_page(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
+        page = browser.new_page(**CONTEXT_OPTIONS)
+        page.route("**/*", request_filter.handle_sync)
 
         while True:
             artist_name = input("🎤 Enter artist name (or 'done' to finish): ").strip()
@@ -72,30 +198,33 @@ if __name__ == "__main__":
             if not artist_url:
                 continue
 
-            events = get_artist_events(artist_url, artist_name, page)
+            events = get_artist_events(artist_url, artist_name, page, timeout)
             if not events:
                 print(f"⚠️ No events found for {artist_name}")
                 continue
 
-            df = pd.DataFrame(events).drop_duplicates()
-            table_name = re.sub(r'\W+', '_', artist_name.lower())
-            df.to_sql(table_name, conn, if_exists="replace", index=False)
-            print(f"✅ Saved {len(df)} events to '{table_name}' table")
-            all_dfs.append(df)
+            sink.write(events)
+            sink.flush()
             time.sleep(0.5)
 
         browser.close()
 
     conn.close()
 
-    if all_dfs:
-        combined_df = pd.concat(all_dfs, ignore_index=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_filename = f"edmtrain_google_scraped_{timestamp}.csv"
-        combined_df.to_csv(csv_filename, index=False)
-        print(f"\n📁 Combined CSV saved as: {csv_filename}")
+    if sink.stats["events"]:
+        print(f"\n📁 Combined CSV saved as: {csv_filename} ({sink.stats['new_rows']} new rows in the events table)")
     else:
         print("⚠️ No data to save")
 
+    print(f"🚫 Request filter: {request_filter.summary()}")
+    metrics.write_run(run_stamp, prom_path)
     print("🏁 Done.")
 
+if __name__ == "__main__":
+    args = parse_args()
+    configure_gazetteer()
+    if args.batch:
+        asyncio.run(run_batch(read_url_pairs(args.batch), pages=args.pages, db_path=args.db,
+                              batch_size=args.batch_size, timeout=args.timeout, prom_path=args.metrics_prom))
+    else:
+        interactive_main(args.db, args.timeout, args.metrics_prom)
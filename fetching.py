@@ -0,0 +1,396 @@
+import asyncio
+import atexit
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from http_cache import ResponseCache
+from metrics import metrics, record_session_response, source_for
+
+headers = {"User-Agent": "Mozilla/5.0"}
+
+session = requests.Session()
+session.headers.update(headers)
+session.hooks["response"].append(record_session_response)
+
+
+# --- Rate Limiting ---
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`; each request takes one."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _HostSlots:
+    def __init__(self, limit, rate):
+        self.limit = limit
+        self.in_flight = 0
+        self.changed = asyncio.Condition()
+        self.bucket = TokenBucket(rate)
+
+
+class HostLimiter:
+    """
+    Caps in-flight requests and request rate separately for every host. The
+    in-flight cap adapts AIMD-style: each healthy response adds 1/limit (about
+    one slot per window of requests), and a throttled or failed one halves it,
+    always staying between `min_per_host` and `max_per_host`.
+    """
+
+    def __init__(self, max_per_host=4, rate_per_host=3.0, min_per_host=1):
+        self.max_per_host = max_per_host
+        self.rate_per_host = rate_per_host
+        self.min_per_host = min_per_host
+        self._hosts = {}
+
+    def _host_state(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = _HostSlots(self.max_per_host, self.rate_per_host)
+        return self._hosts[host]
+
+    def limit(self, url):
+        return int(self._host_state(url).limit)
+
+    @asynccontextmanager
+    async def slot(self, url):
+        state = self._host_state(url)
+        async with state.changed:
+            await state.changed.wait_for(lambda: state.in_flight < int(state.limit))
+            state.in_flight += 1
+        try:
+            await state.bucket.acquire()
+            yield
+        finally:
+            async with state.changed:
+                state.in_flight -= 1
+                state.changed.notify_all()
+
+    async def record(self, url, throttled):
+        state = self._host_state(url)
+        async with state.changed:
+            if throttled:
+                state.limit = max(self.min_per_host, state.limit / 2)
+            else:
+                state.limit = min(self.max_per_host, state.limit + 1 / state.limit)
+            state.changed.notify_all()
+
+
+# --- Retries ---
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class IncompleteCrawl(Exception):
+    """A crawl stopped early because a page could not be fetched; what came before it is still valid."""
+
+
+class CircuitOpenError(IncompleteCrawl):
+    pass
+
+
+def retry_after_seconds(response):
+    """Seconds asked for by a Retry-After header (delta-seconds or HTTP date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Retries throttled (429/503/...) and failed requests with capped exponential
+    backoff and full jitter, waiting at least as long as Retry-After asks. Each
+    host also gets a pacing delay for serial crawls that doubles on throttling
+    and halves on success, down to none at all while the host is healthy.
+    After `failure_threshold` failures in a row a host's circuit opens: requests
+    to it fail fast with CircuitOpenError for `cooldown` seconds, then a single
+    probe is let through and its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, max_retries=4, base_delay=0.5, max_delay=60.0, failure_threshold=8, cooldown=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = {"failures": 0, "open_until": 0.0, "probing": False, "pace": 0.0}
+        return host, self._hosts[host]
+
+    def before(self, url):
+        """Raise CircuitOpenError if the host's circuit is open; otherwise the request may go ahead."""
+        with self._lock:
+            host, state = self._state(url)
+            if state["failures"] < self.failure_threshold:
+                return
+            remaining = state["open_until"] - time.monotonic()
+            if remaining > 0 or state["probing"]:
+                raise CircuitOpenError(f"{host} is failing; circuit open for another {max(remaining, 0):.0f}s")
+            state["probing"] = True
+
+    @staticmethod
+    def is_retryable(response, error=None):
+        if error is not None:
+            return True
+        return not getattr(response, "from_cache", False) and response.status_code in RETRY_STATUSES
+
+    def after(self, url, attempt, response=None, error=None):
+        """
+        Record the outcome of attempt number `attempt` (0-based). Returns the
+        seconds to wait before retrying, or None when the caller should stop,
+        either because the request succeeded or because retrying is pointless.
+        """
+        retryable = self.is_retryable(response, error)
+        with self._lock:
+            host, state = self._state(url)
+            state["probing"] = False
+            if not retryable:
+                state["failures"] = 0
+                state["pace"] = state["pace"] / 2 if state["pace"] > 0.05 else 0.0
+                return None
+            state["failures"] += 1
+            state["pace"] = min(self.max_delay, max(self.base_delay, state["pace"] * 2))
+            if state["failures"] >= self.failure_threshold:
+                state["open_until"] = time.monotonic() + self.cooldown
+                print(f"🔌 {host}: {state['failures']} failures in a row, pausing requests for {self.cooldown:.0f}s")
+                return None
+        if attempt >= self.max_retries:
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        wait = retry_after_seconds(response)
+        if wait is not None and wait > self.max_delay:
+            return None
+        return max(backoff, wait or 0.0)
+
+    def pace(self, url):
+        """Delay to leave between serial requests to this host."""
+        with self._lock:
+            return self._state(url)[1]["pace"]
+
+
+retry_policy = RetryPolicy()
+
+
+# --- Response Cache ---
+cache = None
+
+
+def configure_cache(cache_dir=".http_cache", offline=False, **options):
+    """Route every fetch through an on-disk ResponseCache; offline=True never touches the network."""
+    global cache
+    cache = ResponseCache(cache_dir, offline=offline, **options)
+    # Writes out access times still buffered from cache hits
+    atexit.register(cache.close)
+    return cache
+
+
+# --- Fetching ---
+def fetch_once(url, timeout=30):
+    if cache is not None:
+        response = cache.get(url, session, timeout=timeout)
+        if response.from_cache:
+            metrics.count("cache_hits", source_for(url))
+        return response
+    response = session.get(url, timeout=timeout)
+    response.from_cache = False
+    return response
+
+
+def fetch(url, timeout=30):
+    """
+    GET through the cache with the module's retry policy. Returns the last
+    response once it succeeds or retrying stops. Raises IncompleteCrawl if the
+    last attempt was a network error, and CircuitOpenError while the host is paused.
+    """
+    for attempt in range(retry_policy.max_retries + 1):
+        retry_policy.before(url)
+        response, error = None, None
+        try:
+            response = fetch_once(url, timeout)
+        except requests.RequestException as e:
+            error = e
+        delay = retry_policy.after(url, attempt, response, error)
+        if delay is None:
+            break
+        metrics.count("retries", source_for(url))
+        time.sleep(delay)
+    if error is not None:
+        raise IncompleteCrawl(f"{url} failed after retries: {error}") from error
+    return response
+
+
+async def fetch_async(url, limiter, timeout=30):
+    """fetch() for the event loop: each attempt takes a limiter slot and feeds the host's AIMD limit."""
+    # Fresh cache hits skip the per-host limiter entirely
+    cached = cache.cached(url) if cache is not None else None
+    if cached is not None:
+        metrics.count("cache_hits", source_for(url))
+        return cached
+    for attempt in range(retry_policy.max_retries + 1):
+        retry_policy.before(url)
+        response, error = None, None
+        async with limiter.slot(url):
+            try:
+                response = await asyncio.to_thread(fetch_once, url, timeout)
+            except requests.RequestException as e:
+                error = e
+        await limiter.record(url, throttled=retry_policy.is_retryable(response, error))
+        delay = retry_policy.after(url, attempt, response, error)
+        if delay is None:
+            break
+        metrics.count("retries", source_for(url))
+        await asyncio.sleep(delay)
+    if error is not None:
+        raise IncompleteCrawl(f"{url} failed after retries: {error}") from error
+    return response
+
+
+async def stream_until_empty(scrape_page, max_pages=50, concurrency=4):
+    """
+    Run `scrape_page(page_num)` for pages 1..max_pages with `concurrency` workers
+    and yield each page's items in page order as soon as every earlier page is
+    done. The crawl stops at the first page that comes back empty. Workers stay
+    at most 2 * concurrency pages ahead of the consumer, so memory is bounded by
+    that window rather than by the whole crawl.
+    """
+    done = {}
+    stop_at = max_pages + 1
+    next_page = 1
+    next_emit = 1
+    window = 2 * concurrency
+    changed = asyncio.Condition()
+
+    async def worker():
+        nonlocal next_page, stop_at
+        while True:
+            async with changed:
+                await changed.wait_for(lambda: next_page >= stop_at or next_page < next_emit + window)
+                if next_page >= stop_at:
+                    return
+                page_num = next_page
+                next_page += 1
+            try:
+                items = await scrape_page(page_num)
+            except Exception as exc:
+                items = exc
+            async with changed:
+                if not items:
+                    stop_at = min(stop_at, page_num)
+                done[page_num] = items
+                changed.notify_all()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        while True:
+            async with changed:
+                await changed.wait_for(lambda: next_emit >= stop_at or next_emit in done)
+                if next_emit >= stop_at:
+                    break
+                items = done.pop(next_emit)
+                next_emit += 1
+                changed.notify_all()
+            if isinstance(items, Exception):
+                raise items
+            yield items
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def crawl_until_empty(scrape_page, max_pages=50, concurrency=4):
+    """
+    Run `scrape_page(page_num)` for pages 1..max_pages with `concurrency` workers.
+    The crawl stops at the first page that comes back empty; results from pages
+    before it are returned in page order, exactly like a serial crawl.
+    """
+    return [item async for items in stream_until_empty(scrape_page, max_pages, concurrency) for item in items]
+
+
+def _http_page_scraper(page_url, parse, limiter):
+    # A page that still fails after retries ends the crawl as incomplete, not as the last page
+    async def scrape_page(page_num):
+        url = page_url(page_num)
+        response = await fetch_async(url, limiter)
+        if response.status_code != 200:
+            raise IncompleteCrawl(f"page {page_num} failed with HTTP {response.status_code}: {url}")
+        return parse(response.text)
+    return scrape_page
+
+
+async def stream_pages(page_url, parse, limiter, max_pages=50, concurrency=4):
+    """
+    Fetch and parse numbered pages over HTTP, yielding each page's items in
+    page order. Raises IncompleteCrawl after the last good page if a page fails.
+    """
+    async for items in stream_until_empty(_http_page_scraper(page_url, parse, limiter), max_pages, concurrency):
+        yield items
+
+
+async def crawl_pages(page_url, parse, limiter, max_pages=50, concurrency=4):
+    """Fetch and parse numbered pages over HTTP into one list; a crawl cut short keeps its earlier pages, with a warning."""
+    items = []
+    try:
+        async for page_items in stream_pages(page_url, parse, limiter, max_pages, concurrency):
+            items.extend(page_items)
+    except IncompleteCrawl as e:
+        print(f"⚠️ Incomplete crawl: {e}")
+    return items
+
+
+def iterate_async(pages):
+    """Drive an async page stream from synchronous code, yielding each batch as it arrives; errors propagate."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(pages))
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(pages.aclose())
+        loop.close()
+
+
+def collect_pages(pages):
+    """Flatten an iterator of page batches; a crawl cut short keeps its earlier pages, with a warning."""
+    items = []
+    try:
+        for page_items in pages:
+            items.extend(page_items)
+    except IncompleteCrawl as e:
+        print(f"⚠️ Incomplete crawl: {e}")
+    return items
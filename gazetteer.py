@@ -0,0 +1,167 @@
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# GeoNames dump layout (https://download.geonames.org/export/dump/): cities500.txt / cities15000.txt,
+# with admin1CodesASCII.txt and countryInfo.txt next to it for region and country names.
+CITY_COLUMNS = {1: "name", 2: "asciiname", 4: "latitude", 5: "longitude", 8: "country_code", 10: "admin1", 14: "population"}
+MISSING = {"", "N/A", "n/a", "TBA"}
+MISSING_KEYS = {"", "n a", "tba"}
+
+# Location strings use these where GeoNames has a different name or code
+COUNTRY_ALIASES = {
+    "uk": "GB", "great britain": "GB", "england": "GB", "scotland": "GB", "wales": "GB",
+    "northern ireland": "GB", "usa": "US", "united states of america": "US", "the netherlands": "NL",
+    "holland": "NL", "south korea": "KR", "korea": "KR", "russia": "RU", "czech republic": "CZ",
+}
+
+
+def place_key(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii").lower()
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def _read_tsv(path, usecols, names):
+    return pd.read_csv(path, sep="\t", header=None, usecols=usecols, names=names, comment="#",
+                       quoting=3, dtype=str, keep_default_na=False, encoding="utf-8")
+
+
+class Gazetteer:
+    """
+    Offline geocoder over a GeoNames cities dump. Places live in flat NumPy
+    arrays; a dict maps each normalized name to its place rows, most populous
+    first. `resolve` parses "City, Region, Country" strings and is memoized,
+    so a run only pays for each distinct location once.
+    """
+
+    def __init__(self, cities_path, admin1_path=None, country_info_path=None, min_population=0):
+        folder = os.path.dirname(cities_path)
+        admin1_path = admin1_path or os.path.join(folder, "admin1CodesASCII.txt")
+        country_info_path = country_info_path or os.path.join(folder, "countryInfo.txt")
+
+        cities = _read_tsv(cities_path, list(CITY_COLUMNS), list(CITY_COLUMNS.values()))
+        cities["population"] = pd.to_numeric(cities["population"], errors="coerce").fillna(0).astype(np.int64)
+        cities = cities[cities["population"] >= min_population]
+        cities = cities.sort_values("population", ascending=False, kind="stable").reset_index(drop=True)
+
+        self.latitude = pd.to_numeric(cities["latitude"]).to_numpy(np.float32)
+        self.longitude = pd.to_numeric(cities["longitude"]).to_numpy(np.float32)
+        self.country_codes, self.country_index = np.unique(cities["country_code"].to_numpy(), return_inverse=True)
+        admin1 = (cities["country_code"] + "." + cities["admin1"]).to_numpy()
+        self.admin1_codes, self.admin1_index = np.unique(admin1, return_inverse=True)
+
+        self.names = {}
+        for row, (name, ascii_name) in enumerate(zip(cities["name"], cities["asciiname"])):
+            for key in {place_key(name), place_key(ascii_name)}:
+                self.names.setdefault(key, []).append(row)
+
+        self.country_names = {}
+        self.countries_by_key = {alias: code for alias, code in COUNTRY_ALIASES.items()}
+        if os.path.exists(country_info_path):
+            info = _read_tsv(country_info_path, [0, 1, 4], ["iso", "iso3", "name"])
+            self.country_names = dict(zip(info["iso"], info["name"]))
+            for iso, iso3, name in info.itertuples(index=False):
+                self.countries_by_key.update({place_key(iso): iso, place_key(iso3): iso, place_key(name): iso})
+
+        self.region_names = {}
+        self.regions_by_key = {}
+        if os.path.exists(admin1_path):
+            admin = _read_tsv(admin1_path, [0, 2], ["code", "name"])
+            self.region_names = dict(zip(admin["code"], admin["name"]))
+            for code, name in self.region_names.items():
+                country = code.split(".", 1)[0]
+                for key in (place_key(name), place_key(code.split(".", 1)[-1])):
+                    self.regions_by_key.setdefault(key, set()).add(code)
+                self.regions_by_key.setdefault(place_key(f"{country} {name}"), set()).add(code)
+
+        self.resolve = lru_cache(maxsize=None)(self._resolve)
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def _country_name(self, code):
+        return self.country_names.get(code, code)
+
+    def _resolve(self, location):
+        """Return (country, region, latitude, longitude) for a location string, or None."""
+        parts = [place_key(p) for p in str(location).split(",")]
+        parts = [p for p in parts if p and p not in MISSING_KEYS]
+        if not parts:
+            return None
+        city, context = parts[0], parts[1:]
+        countries = {self.countries_by_key[p] for p in context if p in self.countries_by_key}
+        regions = set().union(*(self.regions_by_key.get(p, set()) for p in context))
+
+        # Rows are most populous first, so stop at the first one matching all the context we recognised
+        target = 2 * bool(countries) + bool(regions)
+        best, best_score = None, -1
+        for row in self.names.get(city, ()):
+            country = self.country_codes[self.country_index[row]]
+            score = 2 * (country in countries) + (self.admin1_codes[self.admin1_index[row]] in regions)
+            if score > best_score:
+                best, best_score = row, score
+            if score == target:
+                break
+        if best is None or (target and best_score == 0):
+            if len(countries) == 1:
+                return self._country_name(next(iter(countries))), None, None, None
+            return None
+
+        admin1 = self.admin1_codes[self.admin1_index[best]]
+        return (self._country_name(self.country_codes[self.country_index[best]]), self.region_names.get(admin1),
+                round(float(self.latitude[best]), 5), round(float(self.longitude[best]), 5))
+
+
+# --- Shared index for ingest ---
+index = None
+
+
+def configure_gazetteer(cities_path=None, **options):
+    """Load the gazetteer used at ingest; the path defaults to $GAZETTEER_PATH."""
+    global index
+    cities_path = cities_path or os.getenv("GAZETTEER_PATH")
+    index = Gazetteer(cities_path, **options) if cities_path else None
+    return index
+
+
+def _missing(values):
+    return values.isna() | values.astype("string").str.strip().isin(MISSING)
+
+
+def fill_locations(df, gazetteer=None):
+    """
+    Fill missing venue_country / venue_region and latitude / longitude from the
+    gazetteer. Only distinct location strings are resolved. Returns the frame
+    and the number of rows that gained a country.
+    """
+    gazetteer = gazetteer or index
+    if gazetteer is None or df.empty:
+        return df, 0
+    df = df.copy()
+    for column in ("venue_city", "city", "venue_region", "venue_country"):
+        df[column] = df[column].astype(object) if column in df.columns else None
+    for column in ("latitude", "longitude"):
+        df[column] = pd.to_numeric(df[column], errors="coerce") if column in df.columns else np.nan
+
+    parts = [df[c].where(~_missing(df[c])) for c in ("venue_city", "venue_region", "venue_country")]
+    parts[0] = parts[0].fillna(df["city"].where(~_missing(df["city"])))
+    location = parts[0].astype("string").str.cat(parts[1:], sep=", ", na_rep="").where(parts[0].notna())
+
+    needs = location.notna() & (_missing(df["venue_country"]) | _missing(df["venue_region"]) | df["latitude"].isna())
+    resolved = {loc: gazetteer.resolve(loc) for loc in location[needs].unique()}
+    found = location.map(resolved).where(needs)
+    found = found.where(found.notna(), None)
+    columns = pd.DataFrame([r if r else (None,) * 4 for r in found],
+                           columns=["country", "region", "latitude", "longitude"], index=df.index)
+
+    gained = _missing(df["venue_country"]) & columns["country"].notna()
+    df.loc[gained, "venue_country"] = columns.loc[gained, "country"]
+    fill_region = _missing(df["venue_region"]) & columns["region"].notna()
+    df.loc[fill_region, "venue_region"] = columns.loc[fill_region, "region"]
+    fill_coords = df["latitude"].isna() & columns["latitude"].notna()
+    df.loc[fill_coords, ["latitude", "longitude"]] = columns.loc[fill_coords, ["latitude", "longitude"]].to_numpy()
+    return df, int(gained.sum())
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+
+# First matching pattern wins. Old gigography pages almost never change; page 1
+# and the artist page pick up new shows, so they expire sooner.
+DEFAULT_TTLS = [
+    (r"/gigography\?page=1$", 24 * 3600),
+    (r"/gigography", 30 * 24 * 3600),
+    (r"/search\?", 7 * 24 * 3600),
+    (r"songkick\.com/artists/[^/?]+/?$", 6 * 3600),
+]
+DEFAULT_TTL = 24 * 3600
+
+
+class ResponseCache:
+    """
+    On-disk HTTP cache. Bodies are stored once per content hash under `bodies/`
+    and an SQLite index maps each URL to its body, validators and timestamps.
+    Expired entries are revalidated with ETag / Last-Modified; once the bodies
+    outgrow `max_bytes`, the least recently used URLs are evicted.
+    """
+
+    def __init__(self, cache_dir=".http_cache", ttls=None, default_ttl=DEFAULT_TTL,
+                 max_bytes=1024 ** 3, offline=False):
+        self.cache_dir = cache_dir
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or DEFAULT_TTLS)]
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "offline_misses": 0}
+        self._lock = threading.Lock()
+        self._touched = {}  # url -> last hit, written to the index with the next store or eviction
+        self._closed = False
+
+        os.makedirs(os.path.join(cache_dir, "bodies"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body_hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                encoding TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def _body_path(self, body_hash):
+        return os.path.join(self.cache_dir, "bodies", body_hash[:2], body_hash)
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body_hash, encoding, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not os.path.exists(self._body_path(row[0])):
+            return None
+        return dict(zip(("body_hash", "encoding", "etag", "last_modified", "fetched_at"), row))
+
+    def _response(self, url, entry, status_code=200):
+        response = requests.Response()
+        response.url = url
+        response.status_code = status_code
+        response.encoding = entry["encoding"] if entry else None
+        response._content = b""
+        if entry:
+            with open(self._body_path(entry["body_hash"]), "rb") as f:
+                response._content = f.read()
+        response.from_cache = True
+        return response
+
+    def _touch(self, url):
+        # Access times only matter when evicting, so a hit just notes the time in memory
+        with self._lock:
+            self._touched[url] = time.time()
+
+    def _flush_touches(self):
+        # Caller holds the lock and commits; returns whether anything was written
+        if not self._touched:
+            return False
+        self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE url = ?",
+                               [(at, url) for url, at in self._touched.items()])
+        self._touched.clear()
+        return True
+
+    def _refresh(self, url):
+        now = time.time()
+        with self._lock:
+            self._touched.pop(url, None)
+            self._conn.execute("UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def _store(self, url, response):
+        body = response.content
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._body_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._touched.pop(url, None)
+            self._flush_touches()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body_hash, len(body), response.encoding, response.headers.get("ETag"),
+                 response.headers.get("Last-Modified"), now, now)
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            if self._flush_touches():
+                self._conn.commit()
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self._conn.execute("SELECT url, body_hash, size FROM responses ORDER BY accessed_at").fetchall()
+            evicted = []
+            for url, body_hash, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((url, body_hash))
+                total -= size
+            self._conn.executemany("DELETE FROM responses WHERE url = ?", [(url,) for url, _ in evicted])
+            self._conn.commit()
+            for _, body_hash in evicted:
+                still_used = self._conn.execute(
+                    "SELECT 1 FROM responses WHERE body_hash = ? LIMIT 1", (body_hash,)
+                ).fetchone()
+                if not still_used and os.path.exists(self._body_path(body_hash)):
+                    os.remove(self._body_path(body_hash))
+
+    def cached(self, url):
+        """Return a response without touching the network, or None if it needs a request."""
+        entry = self._lookup(url)
+        if self.offline and entry is None:
+            self.stats["offline_misses"] += 1
+            return self._response(url, None, status_code=504)
+        if entry and (self.offline or time.time() - entry["fetched_at"] < self.ttl_for(url)):
+            self.stats["hits"] += 1
+            self._touch(url)
+            return self._response(url, entry)
+        return None
+
+    def get(self, url, session, timeout=30):
+        response = self.cached(url)
+        if response is not None:
+            return response
+
+        entry = self._lookup(url)
+        conditional = {}
+        if entry and entry["etag"]:
+            conditional["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            conditional["If-Modified-Since"] = entry["last_modified"]
+
+        response = session.get(url, headers=conditional, timeout=timeout)
+        if response.status_code == 304 and entry:
+            self.stats["revalidated"] += 1
+            self._refresh(url)
+            return self._response(url, entry)
+
+        self.stats["misses"] += 1
+        if response.status_code == 200:
+            self._store(url, response)
+        response.from_cache = False
+        return response
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            if self._flush_touches():
+                self._conn.commit()
+            self._conn.close()
+            self._closed = True
@@ -0,0 +1,246 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from urllib.parse import urlsplit
+
+# Upper bounds in seconds; the last bucket catches everything slower
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+SOURCE_HOSTS = {
+    "songkick.com": "Songkick",
+    "concertarchives.org": "Concert Archives",
+    "edmtrain.com": "EDMTrain",
+    "ra.co": "Resident Advisor",
+}
+RUN = "run"  # pseudo-source for stages shared by every source (browser startup, storage)
+
+
+def _labels(**values):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(values, escaped)) + "}"
+
+
+def source_for(url):
+    host = urlsplit(url).hostname or ""
+    for domain, source in SOURCE_HOSTS.items():
+        if host == domain or host.endswith("." + domain):
+            return source
+    return host or "unknown"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count, "sum": round(self.sum, 4), "max": round(self.max, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 4), "p95": round(self.quantile(0.95), 4),
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+
+class ScrapeMetrics:
+    """
+    Run-wide counters and latency histograms, keyed by source. Fetch latency,
+    status codes and bytes come from every response on the shared session and
+    from browser navigations; parse and storage stages are timed where they
+    run. Thread-safe, since blocking fetches run in worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self.counters = {}   # (name, source) -> number
+            self.statuses = {}   # (source, status) -> count
+            self.stages = {}     # (stage, source) -> Histogram
+
+    def count(self, name, source=RUN, amount=1):
+        with self._lock:
+            self.counters[(name, source)] = self.counters.get((name, source), 0) + amount
+
+    def observe(self, stage, seconds, source=RUN):
+        with self._lock:
+            if (stage, source) not in self.stages:
+                self.stages[(stage, source)] = Histogram()
+            self.stages[(stage, source)].observe(seconds)
+
+    def record_response(self, source, status, nbytes, seconds):
+        with self._lock:
+            self.statuses[(source, status)] = self.statuses.get((source, status), 0) + 1
+        self.count("requests", source)
+        self.count("bytes", source, nbytes or 0)
+        self.observe("fetch", seconds, source)
+
+    @contextmanager
+    def timer(self, stage, source=RUN):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started, source)
+
+    def timed(self, stage, source=RUN):
+        """Decorator form of `timer`; when the function returns a list, its length is counted as <stage>_items."""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage, source):
+                    result = func(*args, **kwargs)
+                if isinstance(result, list):
+                    self.count(f"{stage}_items", source, len(result))
+                return result
+            return wrapper
+        return decorate
+
+    # --- Reporting ---
+    def summary(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self._started
+            sources = {}
+
+            def entry(source):
+                return sources.setdefault(source, {"status_codes": {}, "stages": {}})
+
+            for (name, source), value in self.counters.items():
+                entry(source)[name] = value
+            for (source, status), count in self.statuses.items():
+                entry(source)["status_codes"][str(status)] = count
+            for (stage, source), histogram in self.stages.items():
+                entry(source)["stages"][stage] = histogram.summary()
+            for source, values in sources.items():
+                if "events" in values:
+                    values["events_per_sec"] = round(values["events"] / elapsed, 2) if elapsed else 0.0
+            return {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "elapsed_sec": round(elapsed, 3),
+                "sources": dict(sorted(sources.items())),
+            }
+
+    def prometheus(self, prefix="tour_scraper"):
+        """Render the run in the Prometheus text exposition format."""
+        summary = self.summary()
+        with self._lock:
+            counters = dict(self.counters)
+            statuses = dict(self.statuses)
+            stages = {key: (list(h.buckets), list(h.counts), h.sum, h.count) for key, h in self.stages.items()}
+
+        lines = [
+            f"# HELP {prefix}_requests_total Responses received, by source and HTTP status.",
+            f"# TYPE {prefix}_requests_total counter",
+        ]
+        lines += [f"{prefix}_requests_total{_labels(source=s, status=c)} {n}" for (s, c), n in sorted(statuses.items(), key=str)]
+        for name, kind, help_text in (("bytes", "counter", "Response bytes received."),
+                                      ("events", "counter", "Events written to storage."),
+                                      ("cache_hits", "counter", "Responses served from the HTTP cache."),
+                                      ("retries", "counter", "Requests retried after throttling or errors.")):
+            lines += [f"# HELP {prefix}_{name}_total {help_text}", f"# TYPE {prefix}_{name}_total {kind}"]
+            lines += [f"{prefix}_{name}_total{_labels(source=s)} {v}"
+                      for (n, s), v in sorted(counters.items()) if n == name]
+
+        lines += [f"# HELP {prefix}_events_per_second Events written per second of run time.",
+                  f"# TYPE {prefix}_events_per_second gauge"]
+        lines += [f"{prefix}_events_per_second{_labels(source=s)} {v['events_per_sec']}"
+                  for s, v in summary["sources"].items() if "events_per_sec" in v]
+
+        lines += [f"# HELP {prefix}_stage_seconds Time spent per stage (fetch, parse, store, ...).",
+                  f"# TYPE {prefix}_stage_seconds histogram"]
+        for (stage, source), (buckets, counts, total, count) in sorted(stages.items()):
+            cumulative = 0
+            for bound, n in zip(buckets, counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else bound
+                lines.append(f"{prefix}_stage_seconds_bucket{_labels(stage=stage, source=source, le=le)} {cumulative}")
+            lines.append(f"{prefix}_stage_seconds_sum{_labels(stage=stage, source=source)} {total:.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{_labels(stage=stage, source=source)} {count}")
+
+        lines += [f"# HELP {prefix}_run_seconds Duration of the last run.", f"# TYPE {prefix}_run_seconds gauge",
+                  f"{prefix}_run_seconds {summary['elapsed_sec']}",
+                  f"# HELP {prefix}_last_run_timestamp_seconds When the last run finished.",
+                  f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+                  f"{prefix}_last_run_timestamp_seconds {time.time():.0f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_run(self, run_stamp, prom_path=None):
+        """
+        Write the run's JSON summary to metrics_<run_stamp>.json and, if a path
+        is given or $METRICS_TEXTFILE is set, a Prometheus textfile. The textfile
+        is written to a temporary name first so the node exporter never reads half a file.
+        """
+        json_path = f"metrics_{run_stamp}.json"
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"📈 Run metrics saved to '{json_path}'.")
+
+        prom_path = prom_path or os.getenv("METRICS_TEXTFILE")
+        if prom_path:
+            with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(self.prometheus())
+            os.replace(prom_path + ".tmp", prom_path)
+            print(f"📈 Prometheus metrics written to '{prom_path}'.")
+        return json_path
+
+
+metrics = ScrapeMetrics()
+
+
+# --- Hooks ---
+def record_session_response(response, *args, **kwargs):
+    """requests response hook: one fetch observation per network response."""
+    metrics.record_response(source_for(response.url), response.status_code, len(response.content),
+                            response.elapsed.total_seconds())
+    return response
+
+
+async def record_navigation(source, response, started):
+    """Record a Playwright navigation that began at `started` (a time.perf_counter() reading)."""
+    seconds = time.perf_counter() - started
+    nbytes = 0
+    if response is not None:
+        try:
+            sizes = await response.request.sizes()
+            nbytes = sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+    metrics.record_response(source, response.status if response else None, nbytes, seconds)
+
+
+def record_navigation_sync(source, response, started):
+    seconds = time.perf_counter() - started
+    nbytes = 0
+    if response is not None:
+        try:
+            sizes = response.request.sizes()
+            nbytes = sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+    metrics.record_response(source, response.status if response else None, nbytes, seconds)
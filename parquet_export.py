@@ -0,0 +1,69 @@
+import re
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import dates
+
+PARQUET_DIR = "parquet_export"
+
+# Low-cardinality text is dictionary-encoded in Arrow as well as in the files,
+# so readers get categoricals back instead of millions of repeated strings.
+DICTIONARY_COLUMNS = ["artist", "type", "venue", "venue_city", "venue_region", "venue_country", "city"]
+STRING_COLUMNS = ["date", "event_date", "venue_address", "venue_postal", "url"]
+FLOAT_COLUMNS = ["latitude", "longitude"]
+
+SCHEMA = pa.schema(
+    [pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in DICTIONARY_COLUMNS]
+    + [pa.field(name, pa.string()) for name in STRING_COLUMNS]
+    + [pa.field(name, pa.float64()) for name in FLOAT_COLUMNS]
+    + [pa.field("source", pa.string()), pa.field("year", pa.int32())]
+)
+
+PARTITIONING = ds.partitioning(
+    pa.schema([pa.field("source", pa.string()), pa.field("year", pa.int32())]), flavor="hive"
+)
+
+
+def to_table(events):
+    df = pd.DataFrame(events)
+    if not df.empty and "event_date" not in df.columns:
+        df, _ = dates.normalize_dates(df)
+    df = df.reindex(columns=DICTIONARY_COLUMNS + STRING_COLUMNS + FLOAT_COLUMNS + ["source"])
+    df = df.astype(object).where(df.notna(), None)
+    df["source"] = df["source"].fillna("Unknown")
+    df["year"] = pd.to_numeric(df["event_date"].astype("string").str[:4]).astype("Int32")
+    return pa.Table.from_pandas(df, schema=SCHEMA, preserve_index=False)
+
+
+def append_events(events, root=PARQUET_DIR, batch_name=None):
+    """
+    Write one batch of events (e.g. one artist) as new files under
+    root/source=.../year=.../, never rewriting what is already there.
+    """
+    table = to_table(events)
+    if table.num_rows == 0:
+        return 0
+    batch_name = batch_name or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    batch_name = re.sub(r'\W+', '_', batch_name.lower())
+    ds.write_dataset(
+        table, root, format="parquet", partitioning=PARTITIONING,
+        basename_template=f"{batch_name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(use_dictionary=True, compression="zstd"),
+    )
+    return table.num_rows
+
+
+def read_events(root=PARQUET_DIR, columns=None, sources=None, years=None):
+    """Read back only the requested columns and source/year partitions."""
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    condition = None
+    if sources:
+        condition = ds.field("source").isin(sources)
+    if years:
+        year_filter = ds.field("year").isin(years)
+        condition = year_filter if condition is None else condition & year_filter
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
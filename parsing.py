@@ -0,0 +1,66 @@
+import re
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Script bodies are raw text in HTML (no entities, no nested tags), so a scan
+# for the exact type attribute finds the same blocks as a full parse.
+JSON_LD_RE = re.compile(
+    r"""<script\b[^>]*?\btype\s*=\s*(?:"application/ld\+json"|'application/ld\+json'|application/ld\+json(?=[\s>]))[^>]*>(.*?)</script\s*>""",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def _json_ld_regex(html):
+    return JSON_LD_RE.findall(html)
+
+
+def _json_ld_selectolax(html):
+    return [node.text(deep=True) for node in HTMLParser(html).css('script[type="application/ld+json"]')]
+
+
+def _json_ld_lxml(html):
+    tree = lxml.html.fromstring(html)
+    return [script.text or "" for script in tree.xpath('//script[@type="application/ld+json"]')]
+
+
+def _json_ld_bs4(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return [script.string or "" for script in soup.find_all("script", type="application/ld+json")]
+
+
+BACKENDS = {
+    "regex": _json_ld_regex,
+    "selectolax": _json_ld_selectolax if HTMLParser else None,
+    "lxml": _json_ld_lxml if lxml else None,
+    "bs4": _json_ld_bs4,
+}
+BACKENDS = {name: fn for name, fn in BACKENDS.items() if fn is not None}
+
+backend = "regex"
+
+
+def set_backend(name):
+    global backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable parser backend '{name}'. Available: {', '.join(BACKENDS)}")
+    backend = name
+
+
+def json_ld_blocks(html, backend_name=None):
+    """Return the text of every application/ld+json script, falling back to BeautifulSoup if the fast path fails."""
+    try:
+        return BACKENDS[backend_name or backend](html)
+    except Exception:
+        return _json_ld_bs4(html)
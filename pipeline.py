@@ -0,0 +1,98 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+import dates
+import gazetteer
+from metrics import metrics
+from parquet_export import append_events
+from storage import EVENT_FIELDS, record_crawls, upsert_events
+
+EVENT_COLUMNS = ["artist"] + EVENT_FIELDS
+
+
+class EventSink:
+    """
+    Final stage of the streaming ingest: scrapers push events in as pages come
+    in, and every `batch_size` events are written out together as one SQLite
+    transaction, one Parquet file set and one CSV append. At most one batch is
+    held in memory, and everything flushed before an interruption is kept.
+    Dates are normalized on the way through; rows whose date could not be
+    parsed are still stored, and are also appended to `failures_path`.
+    Missing countries and coordinates are filled from the configured gazetteer.
+    Each write step is timed as a run-level stage in `metrics`. Crawl outcomes
+    queued with `record_crawl` are stored only after the events written before
+    them, so `crawls` never calls a crawl complete whose events are still buffered.
+    """
+
+    def __init__(self, conn=None, parquet_dir=None, csv_path=None, batch_size=1000, run_stamp=None,
+                 failures_path=None):
+        self.conn = conn
+        self.parquet_dir = parquet_dir
+        self.csv_path = csv_path
+        self.batch_size = batch_size
+        self.run_stamp = run_stamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.failures_path = failures_path or f"date_failures_{self.run_stamp}.csv"
+        self.stats = {"events": 0, "new_rows": 0, "batches": 0, "date_failures": 0, "geocoded": 0}
+        self._buffer = []
+        self._cleared = set()
+        self._crawls = []
+
+    def write(self, events):
+        for event in events:
+            self._buffer.append(event)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+
+    def record_crawl(self, artist_name, source, complete, reason=None):
+        self._crawls.append((artist_name, source, complete, reason))
+        if not self._buffer:
+            self.flush()
+
+    def keep_upcoming(self, artist_name, source):
+        """Keep the artist's stored Upcoming rows for `source` instead of replacing them (its upcoming page failed)."""
+        self._cleared.add((artist_name, source))
+
+    def flush(self):
+        if self._buffer:
+            self._write_batch()
+        if self._crawls and self.conn is not None:
+            record_crawls(self.conn, self._crawls)
+        self._crawls = []
+
+    def _write_batch(self):
+        df = pd.DataFrame(self._buffer, columns=EVENT_COLUMNS).drop(columns="event_date").drop_duplicates()
+        self._buffer = []
+        with metrics.timer("geocode"):
+            df, geocoded = gazetteer.fill_locations(df)
+        self.stats["geocoded"] += geocoded
+        with metrics.timer("normalize_dates"):
+            df, failed = dates.normalize_dates(df)
+        if len(failed):
+            failed.to_csv(self.failures_path, mode="a", header=not os.path.exists(self.failures_path), index=False)
+            self.stats["date_failures"] += len(failed)
+            print(f"⚠️ {len(failed)} events with unparseable dates logged to '{self.failures_path}'.")
+        if self.conn is not None:
+            with metrics.timer("store_sqlite"):
+                self.stats["new_rows"] += upsert_events(self.conn, df, cleared=self._cleared)
+        if self.parquet_dir:
+            with metrics.timer("store_parquet"):
+                append_events(df, self.parquet_dir, batch_name=f"{self.run_stamp}_{self.stats['batches']:05d}")
+        if self.csv_path:
+            with metrics.timer("store_csv"):
+                df.to_csv(self.csv_path, mode="a", header=not os.path.exists(self.csv_path), index=False)
+        for source, count in df["source"].value_counts().items():
+            metrics.count("events", source, int(count))
+        self.stats["events"] += len(df)
+        self.stats["batches"] += 1
+        print(f"💾 Wrote batch {self.stats['batches']} ({len(df)} events, {self.stats['events']} so far).")
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,98 @@
+from urllib.parse import urlsplit
+
+# Trackers and ad networks none of the scrapers need, whatever the page
+THIRD_PARTY_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "adservice.google.com", "amazon-adsystem.com", "facebook.net", "facebook.com", "connect.facebook.net",
+    "hotjar.com", "segment.io", "segment.com", "scorecardresearch.com", "quantserve.com", "criteo.com",
+    "clarity.ms", "nr-data.net", "newrelic.com", "sentry.io", "cloudflareinsights.com", "tiktok.com",
+    "twitter.com", "ads-twitter.com", "pinterest.com", "snapchat.com", "bing.com",
+)
+
+# Aborted requests are never downloaded, so bytes avoided are estimated from
+# typical transfer sizes per resource type (HTTP Archive medians, rounded).
+ESTIMATED_BYTES = {
+    "image": 30_000, "media": 250_000, "font": 25_000, "stylesheet": 10_000,
+    "script": 20_000, "xhr": 5_000, "fetch": 5_000, "other": 5_000,
+}
+
+
+class ResourcePolicy:
+    """
+    Decides which requests a page may make. Blocked domains are refused unless
+    they are also in `allow_domains`. Then, if `allow_types` is set, only those
+    resource types load; otherwise everything except `block_types` does.
+    """
+
+    def __init__(self, block_types=(), block_domains=THIRD_PARTY_DOMAINS, allow_types=None, allow_domains=()):
+        self.block_types = set(block_types)
+        self.block_domains = tuple(block_domains)
+        self.allow_types = set(allow_types) if allow_types is not None else None
+        self.allow_domains = tuple(allow_domains)
+
+    @staticmethod
+    def _matches(host, domains):
+        return any(host == d or host.endswith("." + d) for d in domains)
+
+    def allows(self, resource_type, url):
+        host = urlsplit(url).hostname or ""
+        if self._matches(host, self.block_domains) and not self._matches(host, self.allow_domains):
+            return False
+        if self.allow_types is not None:
+            return resource_type in self.allow_types
+        return resource_type not in self.block_types
+
+
+# What each source actually reads: EDMTrain only needs the DOM. Concert Archives rows are read
+# with innerText, which depends on CSS (hidden spans, text-transform), so its stylesheets load.
+# RA needs its scripts and GraphQL fetches, plus CSS so infinite scroll has a layout to grow.
+POLICIES = {
+    "concert_archives": ResourcePolicy(block_types={"image", "media", "font"}),
+    "edmtrain": ResourcePolicy(block_types={"image", "media", "font", "stylesheet"}),
+    "resident_advisor": ResourcePolicy(allow_types={"document", "script", "xhr", "fetch", "stylesheet"}),
+}
+
+
+class RequestFilter:
+    """
+    Playwright route handler that aborts whatever its policy refuses and counts
+    requests allowed, requests blocked (by resource type) and estimated bytes
+    avoided. Install with `page.route("**/*", f.handle)` (or `f.handle_sync`
+    on the sync API), or pass it to `BrowserPool.page(request_filter=f)`.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.stats = {"allowed": 0, "blocked": 0, "bytes_avoided": 0, "blocked_by_type": {}}
+
+    def _decide(self, request):
+        if self.policy.allows(request.resource_type, request.url):
+            self.stats["allowed"] += 1
+            return True
+        self.stats["blocked"] += 1
+        self.stats["bytes_avoided"] += ESTIMATED_BYTES.get(request.resource_type, ESTIMATED_BYTES["other"])
+        by_type = self.stats["blocked_by_type"]
+        by_type[request.resource_type] = by_type.get(request.resource_type, 0) + 1
+        return False
+
+    async def handle(self, route):
+        if self._decide(route.request):
+            await route.continue_()
+        else:
+            await route.abort()
+
+    def handle_sync(self, route):
+        if self._decide(route.request):
+            route.continue_()
+        else:
+            route.abort()
+
+    def summary(self):
+        total = self.stats["allowed"] + self.stats["blocked"]
+        share = self.stats["blocked"] / total if total else 0
+        return (f"{self.stats['blocked']} of {total} requests blocked ({share:.0%}), "
+                f"~{self.stats['bytes_avoided'] / 1024 ** 2:.1f} MB avoided")
+
+
+def make_filter(source):
+    return RequestFilter(POLICIES[source])
@@ -1,71 +1,179 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
-import pandas as pd
-
-def scrape_ra_events(artist):
-    url = f"https://ra.co/dj/{artist}/past-events"
-    all_events = []
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)  # set to False to debug
-        page = browser.new_page()
-        print(f"🌐 Visiting: {url}")
-        page.goto(url, timeout=60000)
-        page.wait_for_timeout(3000)
-
-        # ⬇️ Scroll to load more events (repeat if needed)
-        for _ in range(3):
-            page.mouse.wheel(0, 5000)
-            page.wait_for_timeout(1500)
-
-        html = page.content()
-        soup = BeautifulSoup(html, "html.parser")
-
-        event_blocks = soup.select("li[class*='Column-sc']")  # updated generic selector
-        print(f"🔍 Found {len(event_blocks)} events for {artist}")
-
-        if not event_blocks:
-            print("⚠️ No events found. Dumping HTML for debugging.")
-            with open("debug_ra_page.html", "w", encoding="utf-8") as f:
-                f.write(html)
-
-        for event in event_blocks:
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import date
+from browser_pool import BrowserPool
+from gazetteer import configure_gazetteer
+from parquet_export import PARQUET_DIR
+from pipeline import EventSink
+from request_filter import make_filter
+from metrics import metrics, record_navigation
+from storage import connect
+
+RA_BASE_URL = os.getenv("RA_BASE_URL", "https://ra.co")
+
+# RA renders from its own GraphQL API; we keep those JSON payloads instead of the hashed-class HTML
+GRAPHQL_HINT = "/graphql"
+LOAD_MORE_RE = re.compile(r"load more|show more|view more|older events", re.I)
+ISO_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "viewport": {"width": 1280, "height": 800},
+    "locale": "en-US",
+}
+
+request_filter = make_filter("resident_advisor")
+
+def make_pool(size=1, max_uses=25):
+    return BrowserPool(size=size, max_uses=max_uses, headless=True, context_options=CONTEXT_OPTIONS)
+
+def ra_slug(artist_name):
+    # RA DJ slugs drop spaces and punctuation: "Four Tet" -> "fourtet"
+    return re.sub(r"[^a-z0-9]", "", artist_name.lower())
+
+def past_events_url(slug):
+    return f"{RA_BASE_URL}/dj/{slug}/past-events"
+
+def iter_event_objects(payload):
+    """Walk a GraphQL payload and yield every object shaped like an RA event listing."""
+    if isinstance(payload, list):
+        for item in payload:
+            yield from iter_event_objects(item)
+    elif isinstance(payload, dict):
+        if "id" in payload and "venue" in payload and ("date" in payload or "startTime" in payload):
+            yield payload
+            return
+        for value in payload.values():
+            yield from iter_event_objects(value)
+
+def to_event(raw, artist_name):
+    venue = raw.get("venue") or {}
+    area = venue.get("area") or raw.get("area") or {}
+    country = area.get("country") or {}
+    event_date = raw.get("date") or raw.get("startTime") or "N/A"
+    url = raw.get("contentUrl") or f"/events/{raw['id']}"
+    return {
+        "artist": artist_name,
+        "type": "Upcoming" if ISO_DATE_RE.match(event_date) and event_date[:10] >= date.today().isoformat() else "Past",
+        "date": event_date,
+        "venue": venue.get("name") or "N/A",
+        "venue_address": venue.get("address") or "N/A",
+        "venue_city": area.get("name") or "N/A",
+        "venue_region": "N/A",
+        "venue_country": country.get("name") or "N/A",
+        "venue_postal": "N/A",
+        "city": area.get("name") or "N/A",
+        "url": f"{RA_BASE_URL}{url}" if url.startswith("/") else url,
+        "source": "Resident Advisor",
+    }
+
+async def stream_ra_events(artist_name, pool, slug=None, max_rounds=200, patience=3, round_timeout=5):
+    """
+    Open the artist's past-events page headless and yield new events as RA's
+    GraphQL responses arrive. Keeps scrolling (and pressing any "load more"
+    button) until `patience` rounds in a row bring no new events within
+    `round_timeout` seconds, so the whole history is walked rather than the
+    first few screens.
+    """
+    slug = slug or ra_slug(artist_name)
+    seen = set()
+    fresh = []
+    captures = []
+    grew = asyncio.Event()
+
+    async def capture(response):
+        if GRAPHQL_HINT not in response.url or "json" not in response.headers.get("content-type", ""):
+            return
+        try:
+            body = await response.body()
+        except Exception:
+            return
+        # GraphQL responses have arrived by now, so TTFB from the request timing stands in for latency
+        timing = response.request.timing
+        metrics.record_response("Resident Advisor", response.status, len(body),
+                                max(timing.get("responseStart", 0), 0) / 1000)
+        with metrics.timer("parse", "Resident Advisor"):
             try:
-                date_el = event.select_one("span.loAMdA")
-                title_el = event.select_one("h3 a span")
-                link_el = event.select_one("h3 a")
-                city_el = event.select_one("a[href*='/events/'] span")
-                venue_el = event.select_one("a[data-pw-test-id='event-venue-link'] span")
-
-                date = date_el.text.strip() if date_el else ""
-                title = title_el.text.strip() if title_el else ""
-                city = city_el.text.strip() if city_el else ""
-                venue = venue_el.text.strip() if venue_el else ""
-                link = link_el['href'] if link_el and link_el.has_attr('href') else ""
-
-                if link.startswith("/"):
-                    link = f"https://ra.co{link}"
-
-                all_events.append({
-                    "date": date,
-                    "title": title,
-                    "city": city,
-                    "venue": venue,
-                    "link": link
-                })
-            except Exception as e:
-                print(f"⚠️ Failed to parse an event: {e}")
-
-        browser.close()
-
-    return all_events
+                payload = json.loads(body)
+            except ValueError:
+                return
+            for raw in iter_event_objects(payload):
+                if raw["id"] not in seen:
+                    seen.add(raw["id"])
+                    fresh.append(to_event(raw, artist_name))
+                    metrics.count("parse_items", "Resident Advisor")
+                    grew.set()
+
+    def on_response(response):
+        captures.append(asyncio.ensure_future(capture(response)))
+
+    async def settle():
+        # "networkidle" has already fired after the first load, so wait for new events themselves
+        try:
+            await asyncio.wait_for(grew.wait(), round_timeout)
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.gather(*captures)
+        captures.clear()
+        grew.clear()
+
+    async with pool.page(request_filter=request_filter) as page:
+        page.on("response", on_response)
+        try:
+            print(f"🌐 Visiting: {past_events_url(slug)}")
+            started = time.perf_counter()
+            response = await page.goto(past_events_url(slug), wait_until="domcontentloaded", timeout=60000)
+            await record_navigation("Resident Advisor", response, started)
+            await settle()
+
+            idle_rounds = 0
+            for _ in range(max_rounds):
+                if fresh:
+                    idle_rounds = 0
+                    yield fresh
+                    fresh = []
+                else:
+                    idle_rounds += 1
+                    if idle_rounds >= patience:
+                        break
+
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                load_more = page.get_by_role("button", name=LOAD_MORE_RE)
+                if await load_more.count():
+                    await load_more.first.click()
+                await settle()
+        finally:
+            page.remove_listener("response", on_response)
+
+    if fresh:
+        yield fresh
+    print(f"🔍 Found {len(seen)} events for {artist_name}")
+
+async def scrape_ra_events(artist, pool=None, artist_name=None):
+    if pool is None:
+        async with make_pool() as pool:
+            return await scrape_ra_events(artist, pool, artist_name)
+    return [e async for batch in stream_ra_events(artist_name or artist, pool, slug=artist) for e in batch]
 
 # 🏁 MAIN
-if __name__ == "__main__":
+async def main():
     artist = input("🎤 Enter RA artist name (e.g. justinpaul): ").strip().lower()
-    events = scrape_ra_events(artist)
-
-    df = pd.DataFrame(events)
     filename = f"{artist}_ra_events.csv"
-    df.to_csv(filename, index=False)
-    print(f"✅ Saved {len(df)} events to {filename}")
+    configure_gazetteer()
+    conn = connect("tour_data.db")
+
+    with EventSink(conn, parquet_dir=PARQUET_DIR, csv_path=filename) as sink:
+        async with make_pool() as pool:
+            async for events in stream_ra_events(artist, pool, slug=ra_slug(artist)):
+                sink.write(events)
+
+    conn.close()
+    print(f"✅ Saved {sink.stats['events']} events to {filename} and the events table")
+    print(f"🚫 Request filter: {request_filter.summary()}")
+    metrics.write_run(sink.run_stamp)
+
+if __name__ == "__main__":
+    asyncio.run(main())
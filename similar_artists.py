@@ -1,37 +1,140 @@
 # spotify_similar_artists.py
 
 import os
+import atexit
 import time
+import threading
 import spotipy
 import statistics
 import requests
 import pandas as pd
 from bs4 import BeautifulSoup
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyClientCredentials
 from dotenv import load_dotenv
+from spotify_cache import SpotifyCache
+from similarity import rank_candidates
 
 # Load client credentials from .env file
 load_dotenv()
 client_id = os.getenv("SPOTIFY_CLIENT_ID")
 client_secret = os.getenv("SPOTIFY_CLIENT_SECRET")
 
-# Initialize Spotify client
+# Initialize Spotify client. 429s are left to the shared limiter below so that
+# one Retry-After pauses every worker thread, not just the one that hit it.
 sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
     client_id=client_id,
     client_secret=client_secret
-))
+), status_forcelist=[500, 502, 503, 504])
 
 headers = {"User-Agent": "Mozilla/5.0"}
 
+MAX_WORKERS = 8
+
+# --- Rate Limiting ---
+class RateLimiter:
+    """Thread-safe request spacing shared by all Spotify calls, honoring 429 Retry-After."""
+
+    def __init__(self, rate=10.0, max_retries=5):
+        self.interval = 1.0 / rate
+        self.max_retries = max_retries
+        self.next_slot = 0.0
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot, self.blocked_until)
+            self.next_slot = slot + self.interval
+        time.sleep(max(0.0, slot - now))
+
+    def block_for(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            try:
+                return fn(*args, **kwargs)
+            except SpotifyException as e:
+                if e.http_status != 429 or attempt == self.max_retries:
+                    raise
+                retry_after = float((e.headers or {}).get("Retry-After", 2 ** attempt))
+                print(f"⏳ Spotify rate limit hit, pausing {retry_after:.0f}s...")
+                self.block_for(retry_after)
+
+limiter = RateLimiter()
+cache = SpotifyCache(os.getenv("SPOTIFY_CACHE_PATH", ".spotify_cache.db"))
+atexit.register(cache.close)  # writes out access times buffered from cache hits
+
+class BudgetExhausted(Exception):
+    pass
+
+class CallBudget:
+    """Hard cap on Spotify API requests; cache hits are free. Thread-safe."""
+
+    def __init__(self, max_calls):
+        self.max_calls = max_calls
+        self.used = 0
+        self.lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return self.max_calls - self.used
+
+    def spend(self, calls=1):
+        with self.lock:
+            if self.used + calls > self.max_calls:
+                raise BudgetExhausted(f"API budget of {self.max_calls} calls used up")
+            self.used += calls
+
+def spotify_call(fn, *args, budget=None, **kwargs):
+    # Served from the local cache when fresh; otherwise one rate-limited API call, charged to `budget`
+    endpoint = fn.__name__
+    key = cache.make_key(args, kwargs)
+    value = cache.get(endpoint, key)
+    if value is None:
+        if budget is not None:
+            budget.spend()
+        value = limiter.call(fn, *args, **kwargs)
+        cache.set(endpoint, key, value)
+    return value
+
+# --- Batched Artist Lookup ---
+def get_artists_by_id(artist_ids, budget=None):
+    # Cached per artist rather than per batch, so overlapping ID lists still hit
+    artists = {}
+    missing = []
+    for artist_id in artist_ids:
+        cached = cache.get("artist", artist_id)
+        if cached:
+            artists[artist_id] = cached
+        else:
+            missing.append(artist_id)
+
+    for i in range(0, len(missing), 50):
+        batch = missing[i:i + 50]
+        if budget is not None:
+            budget.spend()
+        for artist in limiter.call(sp.artists, batch)['artists']:
+            if artist:
+                cache.set("artist", artist['id'], artist)
+                artists[artist['id']] = artist
+
+    return [artists[artist_id] for artist_id in artist_ids if artist_id in artists]
+
 # --- Get Artist Info ---
-def get_artist(artist_name):
-    result = sp.search(q=f"artist:{artist_name}", type="artist")['artists']['items']
+def get_artist(artist_name, budget=None):
+    result = spotify_call(sp.search, q=f"artist:{artist_name}", type="artist", budget=budget)['artists']['items']
     return result[0] if result else None
 
 # --- Audio Summary ---
 def get_audio_summary(artist_id):
-    top_tracks = sp.artist_top_tracks(artist_id, country='US')['tracks']
+    top_tracks = spotify_call(sp.artist_top_tracks, artist_id, country='US')['tracks']
     features = [{'popularity': t['popularity'], 'explicit': t['explicit']} for t in top_tracks[:10]]
 
     def avg(key):
@@ -43,14 +146,27 @@ def get_audio_summary(artist_id):
         "Avg Explicitness": avg("explicit")
     }
 
+def get_audio_summaries(artist_ids, max_workers=MAX_WORKERS):
+    """Fetch audio summaries concurrently; artists whose lookup fails are left out."""
+    summaries = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(get_audio_summary, artist_id): artist_id for artist_id in artist_ids}
+        for future in as_completed(futures):
+            try:
+                summaries[futures[future]] = future.result()
+            except Exception as e:
+                print(f"❌ Error fetching top tracks: {e}")
+    return summaries
+
 # --- Custom Similar Artists ---
-def get_custom_similar_artists(seed_artist):
+def get_custom_similar_artists(seed_artist, k=25, shortlist_size=None):
+    """
+    The k candidates closest to the seed, best first, each with a 'similarity'
+    score in (0, 1]. Candidates are ranked rather than cut at fixed thresholds;
+    see similarity.py for the features and weights.
+    """
     seed_id = seed_artist['id']
-    seed_followers = seed_artist['followers']['total']
-    seed_popularity = seed_artist['popularity']
     seed_audio = get_audio_summary(seed_id)
-    seed_avg_popularity = seed_audio["Avg Popularity"]
-    seed_explicit = seed_audio["Avg Explicitness"]
     seed_genres = seed_artist.get('genres', [])
     has_genres = bool(seed_genres)
 
@@ -60,7 +176,7 @@ def get_custom_similar_artists(seed_artist):
     # 1. Spotify Related Artists
     try:
         print("🎯 Trying Spotify's related artists API...")
-        related = sp.artist_related_artists(seed_id)['artists']
+        related = spotify_call(sp.artist_related_artists, seed_id)['artists']
         if related:
             candidates.extend(related)
             print(f"✅ Pulled {len(related)} related artists from Spotify.")
@@ -70,24 +186,26 @@ def get_custom_similar_artists(seed_artist):
     # 2. Genre-Based
     if has_genres:
         print("🔁 Adding genre-based candidates...")
-        for genre in seed_genres:
-            try:
-                print(f"🔍 Searching genre: {genre}")
-                res = sp.search(q=f"genre:{quote(genre)}", type="artist", limit=50)
-                candidates.extend(res['artists']['items'])
-                time.sleep(1)
-            except Exception as e:
-                print(f"❌ Genre search failed: {e}")
-                time.sleep(1)
+
+        def search_genre(genre):
+            print(f"🔍 Searching genre: {genre}")
+            return spotify_call(sp.search, q=f"genre:{quote(genre)}", type="artist", limit=50)['artists']['items']
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = [pool.submit(search_genre, genre) for genre in seed_genres]
+            for future in futures:
+                try:
+                    candidates.extend(future.result())
+                except Exception as e:
+                    print(f"❌ Genre search failed: {e}")
 
     # 3. Popularity-Based Fallback
     if not has_genres or not candidates:
         print("🧭 Falling back to popularity-based search...")
         try:
-            res = sp.search(q="year:2023", type="artist", limit=50)
+            res = spotify_call(sp.search, q="year:2023", type="artist", limit=50)
             candidates.extend(res['artists']['items'])
             print(f"✅ Pulled {len(res['artists']['items'])} fallback artists.")
-            time.sleep(1)
         except Exception as e:
             print(f"❌ Fallback search failed: {e}")
 
@@ -100,38 +218,26 @@ def get_custom_similar_artists(seed_artist):
     ]
     print(f"✅ After deduplication: {len(deduped_candidates)} unique artists")
 
-    # Filtering
-    filtered = []
-    for artist in deduped_candidates:
-        try:
-            followers = artist['followers']['total']
-            if not (0.2 * seed_followers <= followers <= 2.5 * seed_followers):
-                continue
-
-            popularity = artist['popularity']
-            if abs(popularity - seed_popularity) > 25:
-                continue
+    # Fill in any candidates returned without follower/popularity data, 50 IDs per request
+    incomplete = [c['id'] for c in deduped_candidates if 'followers' not in c or 'popularity' not in c]
+    if incomplete:
+        full = {a['id']: a for a in get_artists_by_id(incomplete)}
+        deduped_candidates = [full.get(c['id'], c) for c in deduped_candidates]
 
-            audio = get_audio_summary(artist['id'])
-            if audio["Avg Popularity"] == "N/A" or audio["Avg Explicitness"] == "N/A":
-                continue
+    # Score everyone on metadata first, so only the closest matches cost a top-tracks request
+    shortlist = [a for a, _ in rank_candidates(seed_artist, deduped_candidates, k=shortlist_size or 3 * k)]
 
-            if abs(audio["Avg Popularity"] - seed_avg_popularity) > 25:
-                continue
-            if abs(audio["Avg Explicitness"] - seed_explicit) > 0.3:
-                continue
+    print(f"🎧 Fetching top tracks for {len(shortlist)} shortlisted artists...")
+    audio_by_id = get_audio_summaries([a['id'] for a in shortlist])
 
-            filtered.append(artist)
-            time.sleep(1)
-        except Exception as e:
-            print(f"❌ Error filtering artist: {e}")
-            continue
+    ranked = rank_candidates(seed_artist, shortlist, k=k, audio_by_id=audio_by_id, seed_audio=seed_audio)
+    similar = [{**artist, 'similarity': round(score, 4)} for artist, score in ranked]
 
-    print(f"✅ Final similar artist count: {len(filtered)}")
-    return filtered
+    print(f"✅ Final similar artist count: {len(similar)}")
+    return similar
 
 # --- Main Execution ---
-def find_similar_artist_names(seed_artist_name):
+def find_similar_artist_names(seed_artist_name, k=25):
     seed_artist = get_artist(seed_artist_name)
     if not seed_artist:
         print("❌ Seed artist not found.")
@@ -141,12 +247,14 @@ def find_similar_artist_names(seed_artist_name):
     print("🎧 Genres:", ", ".join(seed_artist.get('genres', [])))
     print("👥 Followers:", seed_artist['followers']['total'])
 
-    similar_artists = get_custom_similar_artists(seed_artist)
+    similar_artists = get_custom_similar_artists(seed_artist, k=k)
     all_names = [seed_artist['name']] + [a['name'] for a in similar_artists]
 
-    print("\n🎵 Similar Artists filtered by audio, genre, and popularity:")
-    for name in all_names:
-        print("-", name)
+    print(f"🗄️ Spotify cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses")
+    print("\n🎵 Similar Artists ranked by audio, genre, and popularity:")
+    print("-", seed_artist['name'])
+    for artist in similar_artists:
+        print(f"- {artist['name']} ({artist['similarity']:.2f})")
 
     return all_names
 
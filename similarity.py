@@ -0,0 +1,96 @@
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+NUMERIC_FEATURES = ("log_followers", "popularity", "track_popularity", "explicitness")
+
+# One unit of distance per feature is about the tolerance the old hard filters allowed:
+# followers within 2.5x, popularity and top-track popularity within 25, explicitness within 0.3
+SCALES = np.array([np.log(2.5), 25.0, 25.0, 0.3], dtype=np.float32)
+
+WEIGHTS = {"log_followers": 1.0, "popularity": 1.0, "track_popularity": 0.75, "explicitness": 0.5, "genres": 1.5}
+
+
+def feature_matrix(artists, audio_by_id=None):
+    """
+    Numeric features for Spotify artist objects and their audio summaries, one
+    float32 row per artist and NaN where a value is unknown (audio summaries say "N/A").
+    """
+    audio_by_id = audio_by_id or {}
+    audios = [audio_by_id.get(a.get("id")) or {} for a in artists]
+    columns = [
+        [(a.get("followers") or {}).get("total") for a in artists],
+        [a.get("popularity") for a in artists],
+        [audio.get("Avg Popularity") for audio in audios],
+        [audio.get("Avg Explicitness") for audio in audios],
+    ]
+    values = np.column_stack([pd.to_numeric(pd.Series(c, dtype=object), errors="coerce").to_numpy(np.float64)
+                              for c in columns]).reshape(len(artists), len(NUMERIC_FEATURES))
+    values[:, 0] = np.log1p(values[:, 0])
+    return values.astype(np.float32)
+
+
+class CandidateMatrix:
+    """
+    Candidate artists as a float32 feature matrix (one row per artist, NaN for
+    unknown values) plus sparse genre membership stored as parallel
+    (row, genre id) arrays. Build it once and score it against any seed; all
+    the work per seed is vectorized over every candidate.
+    """
+
+    def __init__(self, artists, audio_by_id=None):
+        self.artists = list(artists)
+        self.values = feature_matrix(self.artists, audio_by_id)
+
+        genre_lists = [a.get("genres") or () for a in self.artists]
+        self.genre_counts = np.fromiter(map(len, genre_lists), np.int64, len(genre_lists))
+        self.genre_rows = np.repeat(np.arange(len(genre_lists), dtype=np.int32), self.genre_counts)
+        self.genre_cols, genres = pd.factorize(pd.Series(list(chain.from_iterable(genre_lists)), dtype=object))
+        self.genre_ids = {genre: i for i, genre in enumerate(genres)}
+
+    def __len__(self):
+        return len(self.artists)
+
+    def genre_overlap(self, genres):
+        """Jaccard overlap between each candidate's genres and `genres`."""
+        genres = set(genres)
+        seed_cols = [self.genre_ids[g] for g in genres if g in self.genre_ids]
+        shared = np.bincount(self.genre_rows[np.isin(self.genre_cols, seed_cols)], minlength=len(self))
+        union = self.genre_counts + len(genres) - shared
+        return np.divide(shared, union, out=np.zeros(len(self), dtype=np.float32), where=union > 0)
+
+    def distances(self, seed, seed_audio=None, weights=WEIGHTS):
+        """
+        Weighted RMS distance from the seed in scaled feature units. A feature
+        unknown for the seed or a candidate is left out of that candidate's
+        average instead of counting against it; genres only count when the seed has some.
+        """
+        seed_values = feature_matrix([seed], {seed.get("id"): seed_audio})[0]
+        diffs = (self.values - seed_values) / SCALES
+        w = np.array([weights.get(f, 0.0) for f in NUMERIC_FEATURES], dtype=np.float32)
+        known = ~np.isnan(diffs)
+        total = (np.where(known, diffs, 0) ** 2 * w).sum(axis=1)
+        weight_sum = (known * w).sum(axis=1)
+
+        seed_genres = seed.get("genres") or ()
+        if seed_genres and weights.get("genres"):
+            total += weights["genres"] * (1 - self.genre_overlap(seed_genres)) ** 2
+            weight_sum += weights["genres"]
+
+        mean = np.divide(total, weight_sum, out=np.full(len(self), np.inf, dtype=np.float32), where=weight_sum > 0)
+        return np.sqrt(mean)
+
+    def top_k(self, seed, k=25, seed_audio=None, weights=WEIGHTS):
+        """Up to k (artist, score) pairs, best first. Scores are exp(-distance): 1 matches the seed exactly."""
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        scores = np.exp(-self.distances(seed, seed_audio, weights))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.artists[i], float(scores[i])) for i in top]
+
+
+def rank_candidates(seed, candidates, k=25, audio_by_id=None, seed_audio=None, weights=WEIGHTS):
+    return CandidateMatrix(candidates, audio_by_id).top_k(seed, k, seed_audio, weights)
@@ -1,166 +1,225 @@
-import requests
+import itertools
+import os
 from bs4 import BeautifulSoup
 import time
 import json
-import pandas as pd
-import sqlite3
-import re
 from datetime import datetime
-
-headers = {
-    "User-Agent": "Mozilla/5.0"
-}
+from parsing import json_ld_blocks
+from parquet_export import PARQUET_DIR
+from gazetteer import configure_gazetteer
+from pipeline import EventSink
+from storage import connect
+from fetching import (HostLimiter, IncompleteCrawl, collect_pages, crawl_pages, fetch, iterate_async, retry_policy,
+                      stream_pages)
+from metrics import metrics
+
+# Overridable so the benchmark can point the scraper at a local server
+SONGKICK_BASE_URL = os.getenv("SONGKICK_BASE_URL", "https://www.songkick.com")
 
 def find_songkick_artist_url(artist_name):
-    search_url = f"https://www.songkick.com/search?query={artist_name.replace(' ', '+')}"
-    response = requests.get(search_url, headers=headers)
+    search_url = f"{SONGKICK_BASE_URL}/search?query={artist_name.replace(' ', '+')}"
+    response = fetch(search_url)
     if response.status_code != 200:
-        return None, f"Search failed: {response.status_code}"
+        # Still failing after retries: not the same as the artist having no history
+        raise IncompleteCrawl(f"Songkick search failed with HTTP {response.status_code}")
 
     soup = BeautifulSoup(response.text, 'html.parser')
     for link in soup.select('li a[href^="/artists/"]'):
         if artist_name.lower() in link.text.strip().lower():
-            return "https://www.songkick.com" + link['href'], None
+            return SONGKICK_BASE_URL + link['href'], None
 
     return None, f"Artist '{artist_name}' not found on Songkick"
 
 def scrape_events_from_page(url, section_name):
-    response = requests.get(url, headers=headers)
+    response = fetch(url)
     if response.status_code != 200:
         return [], f"Failed to fetch {section_name} page: {response.status_code}"
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    with metrics.timer("parse", "Songkick"):
+        soup = BeautifulSoup(response.text, 'html.parser')
+        events = []
+
+        for li in soup.select('li.concert'):
+            date = li.select_one('.date strong')
+            venue = li.select_one('.location .venue-name')
+            city = li.select_one('.location .location')
+            link = li.select_one('a.event-link')
+
+            if date and venue and city and link:
+                events.append({
+                    'date': date.text.strip(),
+                    'venue': venue.text.strip(),
+                    'venue_address': 'N/A',
+                    'venue_city': city.text.strip(),
+                    'venue_region': 'N/A',
+                    'venue_country': 'N/A',
+                    'venue_postal': 'N/A',
+                    'city': city.text.strip(),
+                    'url': SONGKICK_BASE_URL + link['href'],
+                    'type': section_name
+                })
+
+    metrics.count("parse_items", "Songkick", len(events))
+    return events, None
+
+@metrics.timed("parse", "Songkick")
+def parse_past_events(html, artist_url):
     events = []
 
-    for li in soup.select('li.concert'):
-        date = li.select_one('.date strong')
-        venue = li.select_one('.location .venue-name')
-        city = li.select_one('.location .location')
-        link = li.select_one('a.event-link')
-
-        if date and venue and city and link:
-            events.append({
-                'date': date.text.strip(),
-                'venue': venue.text.strip(),
-                'venue_address': 'N/A',
-                'venue_city': city.text.strip(),
-                'venue_region': 'N/A',
-                'venue_country': 'N/A',
-                'venue_postal': 'N/A',
-                'city': city.text.strip(),
-                'url': "https://www.songkick.com" + link['href'],
-                'type': section_name
-            })
+    for block in json_ld_blocks(html):
+        try:
+            data = json.loads(block)
+            items = data if isinstance(data, list) else [data]
+
+            for event in items:
+                if event.get('@type') == 'MusicEvent':
+                    location = event.get('location', {})
+                    address = location.get('address', {})
+
+                    events.append({
+                        'date': event.get('startDate', 'N/A'),
+                        'venue': location.get('name', 'N/A'),
+                        'venue_address': address.get('streetAddress', 'N/A'),
+                        'venue_city': address.get('addressLocality', 'N/A'),
+                        'venue_region': address.get('addressRegion', 'N/A'),
+                        'venue_country': address.get('addressCountry', 'N/A'),
+                        'venue_postal': address.get('postalCode', 'N/A'),
+                        'city': address.get('addressLocality', 'N/A'),
+                        'url': event.get('url', artist_url),
+                        'type': 'Past'
+                    })
+
+        except (json.JSONDecodeError, TypeError):
+            continue
 
-    return events, None
+    return events
 
-def scrape_all_past_events(artist_url, max_pages=50):
-    all_events = []
+def iter_past_events(artist_url, max_pages=50, known_urls=None):
+    """
+    Yield the gigography one page of events at a time. With `known_urls` only
+    unseen events are yielded, and paging stops at the first page that reaches
+    an event we already have (the gigography is newest-first). A page that
+    still fails after retries raises IncompleteCrawl instead of ending quietly.
+    """
+    known_urls = set(known_urls or ()) - {artist_url}
     base_url = artist_url.rstrip('/') + "/gigography"
 
     for page_num in range(1, max_pages + 1):
-        paged_url = f"{base_url}?page={page_num}"
-        response = requests.get(paged_url, headers=headers)
+        page_url = f"{base_url}?page={page_num}"
+        response = fetch(page_url)
         if response.status_code != 200:
-            break
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        scripts = soup.find_all("script", type="application/ld+json")
+            raise IncompleteCrawl(f"gigography page {page_num} failed with HTTP {response.status_code}")
 
-        found_event_on_page = False
-        for script in scripts:
-            try:
-                data = json.loads(script.string)
-                events = data if isinstance(data, list) else [data]
-
-                for event in events:
-                    if event.get('@type') == 'MusicEvent':
-                        location = event.get('location', {})
-                        address = location.get('address', {})
-
-                        all_events.append({
-                            'date': event.get('startDate', 'N/A'),
-                            'venue': location.get('name', 'N/A'),
-                            'venue_address': address.get('streetAddress', 'N/A'),
-                            'venue_city': address.get('addressLocality', 'N/A'),
-                            'venue_region': address.get('addressRegion', 'N/A'),
-                            'venue_country': address.get('addressCountry', 'N/A'),
-                            'venue_postal': address.get('postalCode', 'N/A'),
-                            'city': address.get('addressLocality', 'N/A'),
-                            'url': event.get('url', artist_url),
-                            'type': 'Past'
-                        })
-
-                        found_event_on_page = True
-
-            except (json.JSONDecodeError, TypeError):
-                continue
+        events = parse_past_events(response.text, artist_url)
+        if not events:
+            break
 
-        if not found_event_on_page:
+        yield [e for e in events if e['url'] not in known_urls]
+        if any(e['url'] in known_urls for e in events):
             break
 
-        time.sleep(0.3)
+        if not response.from_cache:
+            time.sleep(retry_policy.pace(page_url))
 
-    return all_events
+def scrape_all_past_events(artist_url, max_pages=50):
+    return collect_pages(iter_past_events(artist_url, max_pages))
+
+def scrape_new_past_events(artist_url, known_urls, max_pages=50):
+    return collect_pages(iter_past_events(artist_url, max_pages, known_urls))
 
-def get_tour_data_for_artist(artist_name):
+def _gigography_pages(artist_url, limiter):
+    base_url = artist_url.rstrip('/') + "/gigography"
+    return (lambda page_num: f"{base_url}?page={page_num}",
+            lambda html: parse_past_events(html, artist_url),
+            limiter)
+
+async def scrape_all_past_events_async(artist_url, max_pages=50, max_per_host=4, rate_per_host=3.0, limiter=None):
+    # Pass a shared limiter to keep several artists' crawls under one per-host budget
+    limiter = limiter or HostLimiter(max_per_host, rate_per_host)
+    return await crawl_pages(*_gigography_pages(artist_url, limiter), max_pages=max_pages,
+                             concurrency=limiter.max_per_host)
+
+def stream_past_events_async(artist_url, max_pages=50, max_per_host=4, rate_per_host=3.0, limiter=None):
+    # Unlike scrape_all_past_events_async, a page that fails raises IncompleteCrawl after the pages before it
+    limiter = limiter or HostLimiter(max_per_host, rate_per_host)
+    return stream_pages(*_gigography_pages(artist_url, limiter), max_pages=max_pages,
+                        concurrency=limiter.max_per_host)
+
+def iter_tour_data_for_artist(artist_name, concurrent=False, known_urls=None, on_upcoming_error=None):
+    """
+    Yield an artist's events in batches: upcoming shows first, then each gigography page.
+    If the upcoming page failed, `on_upcoming_error()` is called before the first batch.
+    """
     artist_url, error = find_songkick_artist_url(artist_name)
     if error:
         print(f"⚠️ {artist_name}: {error}")
-        return []
+        return
 
     print(f"🔗 Found artist page: {artist_url}")
     print("🎟️ Scraping all concert data for your chosen artist...")
 
-    upcoming, _ = scrape_events_from_page(artist_url, "Upcoming")
-    past = scrape_all_past_events(artist_url)
+    upcoming, upcoming_error = scrape_events_from_page(artist_url, "Upcoming")
+    if upcoming_error and on_upcoming_error:
+        on_upcoming_error()
+    if concurrent and not known_urls:
+        pages = iterate_async(stream_past_events_async(artist_url))
+    else:
+        pages = iter_past_events(artist_url, known_urls=known_urls)
 
-    events = upcoming + past
-    for e in events:
-        e["artist"] = artist_name
+    for events in itertools.chain([upcoming], pages):
+        for e in events:
+            e["artist"] = artist_name
+        yield events
+    if upcoming_error:
+        raise IncompleteCrawl(upcoming_error)
 
-    return events
+def get_tour_data_for_artist(artist_name, concurrent=False, known_urls=None):
+    return collect_pages(iter_tour_data_for_artist(artist_name, concurrent, known_urls))
 
 # 🏁 MAIN
 if __name__ == "__main__":
-    conn = sqlite3.connect("tour_data.db")
-    all_dfs = []
-
-    while True:
-        artist_name = input("🎤 Enter artist name (or type 'done' to finish): ").strip()
-        if artist_name.lower() == 'done':
-            break
-
-        print(f"\n🔍 Fetching data for: {artist_name}")
-        events = get_tour_data_for_artist(artist_name)
-        if not events:
-            print(f"❌ No events found for {artist_name}.")
-            continue
-
-        df = pd.DataFrame(events, columns=[
-            "artist", "type", "date", "venue", "venue_address", "venue_city",
-            "venue_region", "venue_country", "venue_postal", "city", "url"
-        ])
-        df = df.drop_duplicates()
-
-        # Sanitize table name for SQLite
-        table_name = re.sub(r'\W+', '_', artist_name.lower())
-        df.to_sql(table_name, conn, if_exists="replace", index=False)
-        print(f"✅ Saved {len(df)} events to table '{table_name}' in database.")
+    configure_gazetteer()
+    conn = connect("tour_data.db")
+    run_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    csv_filename = f"all_tour_data_{run_stamp}.csv"
+    sink = EventSink(conn, parquet_dir=PARQUET_DIR, csv_path=csv_filename, run_stamp=run_stamp)
+
+    with sink:
+        while True:
+            artist_name = input("🎤 Enter artist name (or type 'done' to finish): ").strip()
+            if artist_name.lower() == 'done':
+                break
+
+            print(f"\n🔍 Fetching data for: {artist_name}")
+            found = 0
+            try:
+                for events in iter_tour_data_for_artist(
+                        artist_name, on_upcoming_error=lambda: sink.keep_upcoming(artist_name, "Songkick")):
+                    for e in events:
+                        e["source"] = "Songkick"
+                    sink.write(events)
+                    found += len(events)
+                sink.record_crawl(artist_name, "Songkick", complete=True)
+            except IncompleteCrawl as e:
+                print(f"⚠️ {artist_name}: crawl cut short and marked incomplete ({e})")
+                sink.record_crawl(artist_name, "Songkick", complete=False, reason=str(e))
+
+            if not found:
+                print(f"❌ No events found for {artist_name}.")
+                continue
 
-        all_dfs.append(df)
-        time.sleep(0.5)
+            print(f"✅ Scraped {found} events for {artist_name}.")
+            # Don't leave a finished artist buffered while waiting at the prompt
+            sink.flush()
+            time.sleep(0.5)
 
     conn.close()
 
-    if all_dfs:
-        combined_df = pd.concat(all_dfs, ignore_index=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        csv_filename = f"all_tour_data_{timestamp}.csv"
-        combined_df.to_csv(csv_filename, index=False)
-        print(f"📁 Combined CSV saved as '{csv_filename}' with {len(combined_df)} total events.")
+    if sink.stats["events"]:
+        print(f"📁 Combined CSV saved as '{csv_filename}' with {sink.stats['events']} total events "
+              f"({sink.stats['new_rows']} new in the events table).")
     else:
         print("⚠️ No data to save to CSV.")
+    metrics.write_run(run_stamp)
 
     print("🏁 Done. All artist data saved.")
-
@@ -0,0 +1,115 @@
+import json
+import sqlite3
+import threading
+import time
+
+DAY = 24 * 3600
+
+# Follower counts and track popularity drift within days; related-artist and
+# genre results move much more slowly.
+DEFAULT_TTLS = {
+    "search": 7 * DAY,
+    "artist": 3 * DAY,
+    "artist_top_tracks": 3 * DAY,
+    "artist_related_artists": 14 * DAY,
+}
+DEFAULT_TTL = 3 * DAY
+
+
+class SpotifyCache:
+    """
+    SQLite-backed cache of Spotify API responses, keyed on endpoint + arguments.
+    Each endpoint has its own TTL; when stored responses exceed `max_bytes` the
+    least recently used ones are evicted. `stats` counts hits and misses.
+    """
+
+    def __init__(self, path=".spotify_cache.db", ttls=None, max_bytes=256 * 1024 ** 2):
+        self.ttls = DEFAULT_TTLS | (ttls or {})
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._touched = {}  # (endpoint, key) -> last hit, written with the next set or on close
+        self._closed = False
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                endpoint TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (endpoint, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(args, kwargs):
+        return json.dumps([list(args), kwargs], sort_keys=True, default=str)
+
+    def get(self, endpoint, key):
+        ttl = self.ttls.get(endpoint, DEFAULT_TTL)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, fetched_at FROM responses WHERE endpoint = ? AND key = ?", (endpoint, key)
+            ).fetchone()
+            if row is None or now - row[1] >= ttl:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            # Access times only matter when evicting, so hits stay read-only
+            self._touched[(endpoint, key)] = now
+        return json.loads(row[0])
+
+    def _flush_touches(self):
+        # Caller holds the lock and commits; returns whether anything was written
+        if not self._touched:
+            return False
+        self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE endpoint = ? AND key = ?",
+                               [(at, endpoint, key) for (endpoint, key), at in self._touched.items()])
+        self._touched.clear()
+        return True
+
+    def set(self, endpoint, key, value):
+        now = time.time()
+        with self._lock:
+            self._touched.pop((endpoint, key), None)
+            self._flush_touches()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (endpoint, key, json.dumps(value), now, now)
+            )
+            self._conn.commit()
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 100:
+                self._writes_since_evict = 0
+                self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        rows = self._conn.execute(
+            "SELECT endpoint, key, LENGTH(value) FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for endpoint, key, size in rows:
+            if excess <= 0:
+                break
+            evicted.append((endpoint, key))
+            excess -= size
+        self._conn.executemany("DELETE FROM responses WHERE endpoint = ? AND key = ?", evicted)
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            if self._flush_touches():
+                self._conn.commit()
+            self._conn.close()
+            self._closed = True
@@ -0,0 +1,335 @@
+import argparse
+import sqlite3
+import pandas as pd
+
+import aggregates
+import dates
+import dedup
+import gazetteer
+
+EVENT_FIELDS = [
+    "type", "date", "venue", "venue_address", "venue_city",
+    "venue_region", "venue_country", "venue_postal", "city", "url", "source", "event_date",
+    "latitude", "longitude"
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    artist_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    event_id INTEGER PRIMARY KEY,
+    artist_id INTEGER NOT NULL REFERENCES artists (artist_id),
+    source TEXT NOT NULL,
+    type TEXT,
+    date TEXT NOT NULL,
+    venue TEXT,
+    venue_address TEXT,
+    venue_city TEXT,
+    venue_region TEXT,
+    venue_country TEXT,
+    venue_postal TEXT,
+    city TEXT,
+    url TEXT NOT NULL,
+    event_date TEXT,
+    latitude REAL,
+    longitude REAL,
+    show_id INTEGER,
+    UNIQUE (artist_id, source, url, date)
+);
+
+-- One row per real-world show after cross-source entity resolution (see dedup.py)
+CREATE TABLE IF NOT EXISTS shows (
+    show_id INTEGER PRIMARY KEY,
+    artist_id INTEGER NOT NULL REFERENCES artists (artist_id),
+    event_date TEXT,
+    type TEXT,
+    venue TEXT,
+    venue_address TEXT,
+    venue_city TEXT,
+    venue_region TEXT,
+    venue_country TEXT,
+    venue_postal TEXT,
+    city TEXT,
+    url TEXT,
+    latitude REAL,
+    longitude REAL,
+    sources TEXT NOT NULL,
+    provenance TEXT NOT NULL
+);
+
+-- Outcome of the latest crawl per artist and source; complete = 0 means it was cut short
+CREATE TABLE IF NOT EXISTS crawls (
+    artist_id INTEGER NOT NULL REFERENCES artists (artist_id),
+    source TEXT NOT NULL,
+    complete INTEGER NOT NULL,
+    reason TEXT,
+    crawled_at TEXT NOT NULL,
+    PRIMARY KEY (artist_id, source)
+);
+
+CREATE INDEX IF NOT EXISTS idx_events_artist_date ON events (artist_id, date);
+CREATE INDEX IF NOT EXISTS idx_events_country ON events (venue_country);
+CREATE INDEX IF NOT EXISTS idx_events_source ON events (source);
+CREATE INDEX IF NOT EXISTS idx_shows_artist_date ON shows (artist_id, event_date);
+"""
+
+STORAGE_TABLES = {"artists", "events", "shows", "crawls"}
+
+# Columns added after a table first shipped; connect() adds them to older databases
+ADDED_COLUMNS = {
+    "events": {"event_date": "TEXT", "show_id": "INTEGER", "latitude": "REAL", "longitude": "REAL"},
+    "shows": {"latitude": "REAL", "longitude": "REAL"},
+}
+
+UPSERT_SQL = f"""
+INSERT INTO events (artist_id, {", ".join(EVENT_FIELDS)})
+VALUES (?, {", ".join("?" for _ in EVENT_FIELDS)})
+ON CONFLICT (artist_id, source, url, date) DO UPDATE SET
+    {", ".join(f"{field} = excluded.{field}" for field in EVENT_FIELDS if field not in ("source", "url", "date"))}
+"""
+
+
+def connect(db_path="tour_data.db"):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, kind in columns.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_artist_event_date ON events (artist_id, event_date)")
+    conn.executescript(aggregates.SCHEMA)
+    return conn
+
+
+def get_artist_id(conn, artist_name):
+    conn.execute("INSERT OR IGNORE INTO artists (name) VALUES (?)", (artist_name,))
+    return conn.execute("SELECT artist_id FROM artists WHERE name = ?", (artist_name,)).fetchone()[0]
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+def upsert_events(conn, events, replace_upcoming=True, cleared=None):
+    """
+    Insert or update events keyed on (artist, source, url, date) in one
+    transaction. Stored Upcoming rows for each artist/source being written are
+    dropped first, since shows get moved and cancelled. When one scrape is
+    written in several batches, pass the same `cleared` set to every call so
+    those rows are only dropped before the first batch. The touched artists'
+    shows and rollups are refreshed in the same transaction. Events without a canonical
+    `event_date` are normalized here. Returns the number of new rows.
+    """
+    events = pd.DataFrame(events)
+    if events.empty:
+        return 0
+    if "event_date" not in events.columns:
+        events, _ = dates.normalize_dates(events)
+    events = events.to_dict("records")
+
+    by_artist = {}
+    for event in events:
+        by_artist.setdefault(event["artist"], []).append(event)
+
+    new_rows = 0
+    with conn:
+        for artist_name, artist_events in by_artist.items():
+            artist_id = get_artist_id(conn, artist_name)
+            if replace_upcoming:
+                sources = {_clean(e.get("source")) or "Unknown" for e in artist_events}
+                if cleared is not None:
+                    sources -= {source for name, source in cleared if name == artist_name}
+                    cleared.update((artist_name, source) for source in sources)
+                conn.executemany(
+                    "DELETE FROM events WHERE artist_id = ? AND source = ? AND type = 'Upcoming'",
+                    [(artist_id, source) for source in sources]
+                )
+            before = conn.execute("SELECT COUNT(*) FROM events WHERE artist_id = ?", (artist_id,)).fetchone()[0]
+
+            rows = []
+            for event in artist_events:
+                values = {field: _clean(event.get(field)) for field in EVENT_FIELDS}
+                values["source"] = values["source"] or "Unknown"
+                values["url"] = values["url"] or ""
+                values["date"] = values["date"] or "N/A"
+                rows.append((artist_id, *(values[field] for field in EVENT_FIELDS)))
+            conn.executemany(UPSERT_SQL, rows)
+
+            after = conn.execute("SELECT COUNT(*) FROM events WHERE artist_id = ?", (artist_id,)).fetchone()[0]
+            new_rows += after - before
+            refresh_artists(conn, [artist_id])
+    return new_rows
+
+
+def refresh_artists(conn, artist_ids):
+    """Re-resolve the artists' events into shows, then recompute their rollups from those shows."""
+    merged = sum(dedup.resolve_artist(conn, artist_id) for artist_id in artist_ids)
+    aggregates.refresh_artist_rollups(conn, artist_ids)
+    return merged
+
+
+def rebuild_derived(conn):
+    artist_ids = [row[0] for row in conn.execute("SELECT artist_id FROM artists").fetchall()]
+    with conn:
+        merged = refresh_artists(conn, artist_ids)
+    return len(artist_ids), merged
+
+
+def known_event_urls(conn, artist_name, source="Songkick"):
+    rows = conn.execute("""
+        SELECT e.url FROM events e JOIN artists a ON a.artist_id = e.artist_id
+        WHERE a.name = ? AND e.source = ? AND e.type = 'Past'
+    """, (artist_name, source)).fetchall()
+    return {row[0] for row in rows}
+
+
+def record_crawls(conn, crawls):
+    """Store (artist_name, source, complete, reason) crawl outcomes in one transaction."""
+    with conn:
+        conn.executemany("""
+            INSERT INTO crawls (artist_id, source, complete, reason, crawled_at) VALUES (?, ?, ?, ?, datetime('now'))
+            ON CONFLICT (artist_id, source) DO UPDATE SET
+                complete = excluded.complete, reason = excluded.reason, crawled_at = excluded.crawled_at
+        """, [(get_artist_id(conn, artist_name), source, int(complete), reason)
+              for artist_name, source, complete, reason in crawls])
+
+
+def record_crawl(conn, artist_name, source, complete, reason=None):
+    record_crawls(conn, [(artist_name, source, complete, reason)])
+
+
+def crawl_complete(conn, artist_name, source="Songkick"):
+    """False when the artist's last crawl of `source` was cut short, so an incremental run can't trust it."""
+    row = conn.execute("""
+        SELECT c.complete FROM crawls c JOIN artists a ON a.artist_id = c.artist_id WHERE a.name = ? AND c.source = ?
+    """, (artist_name, source)).fetchone()
+    return row is None or bool(row[0])
+
+
+def list_artists(conn):
+    return pd.read_sql("""
+        SELECT a.artist_id, a.name, COUNT(e.event_id) AS events
+        FROM artists a JOIN events e ON e.artist_id = a.artist_id
+        GROUP BY a.artist_id ORDER BY a.name
+    """, conn)
+
+
+def load_artist_events(conn, artist_id):
+    return pd.read_sql(
+        f"SELECT {', '.join(EVENT_FIELDS)} FROM events WHERE artist_id = ? ORDER BY event_date", conn,
+        params=(artist_id,)
+    )
+
+
+def normalize_stored_dates(conn):
+    """Fill `event_date` on rows stored before dates were normalized at ingest; returns (filled, failed rows)."""
+    df = pd.read_sql("SELECT event_id, artist_id, source, type, date FROM events WHERE event_date IS NULL", conn)
+    if df.empty:
+        return 0, df
+    df, failed = dates.normalize_dates(df)
+    filled = df.dropna(subset=["event_date"])
+    with conn:
+        conn.executemany(
+            "UPDATE events SET event_date = ? WHERE event_id = ?",
+            [(event_date, int(event_id)) for event_date, event_id in zip(filled["event_date"], filled["event_id"])]
+        )
+        refresh_artists(conn, [int(a) for a in filled["artist_id"].unique()])
+    return len(filled), failed
+
+
+def geocode_stored_events(conn, index=None):
+    """Fill country, region and coordinates on stored rows the gazetteer can place; returns rows that gained a country."""
+    df = pd.read_sql("""
+        SELECT event_id, artist_id, venue_city, city, venue_region, venue_country, latitude, longitude FROM events
+        WHERE latitude IS NULL OR venue_country IS NULL OR venue_country IN ('', 'N/A')
+    """, conn)
+    filled, gained = gazetteer.fill_locations(df, index)
+    changed = filled[filled["latitude"].notna() | (filled["venue_country"] != df["venue_country"])]
+    if changed.empty:
+        return 0
+    with conn:
+        conn.executemany(
+            "UPDATE events SET venue_country = ?, venue_region = ?, latitude = ?, longitude = ? WHERE event_id = ?",
+            [(_clean(r.venue_country), _clean(r.venue_region), r.latitude, r.longitude, int(r.event_id))
+             for r in changed.itertuples(index=False)]
+        )
+        refresh_artists(conn, [int(a) for a in changed["artist_id"].unique()])
+    return gained
+
+
+# --- Migration from one-table-per-artist databases ---
+def _infer_source(row):
+    url = str(row.get("url") or "")
+    if "concertarchives.org" in url:
+        return "Concert Archives"
+    if "edmtrain.com" in url or row.get("type") == "EDMTrainDirect":
+        return "EDMTrain"
+    if "ra.co" in url:
+        return "Resident Advisor"
+    return "Songkick"
+
+
+def migrate_per_artist_tables(conn, drop=False):
+    """Import every legacy per-artist table into `events`; returns {table: rows imported}."""
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()]
+    imported = {}
+    for table_name in tables:
+        if table_name in STORAGE_TABLES or table_name in aggregates.ROLLUPS:
+            continue
+        df = pd.read_sql(f'SELECT * FROM "{table_name}"', conn)
+        if "date" not in df.columns:
+            continue
+        fallback_name = table_name.replace("_", " ").title()
+        if "artist" not in df.columns:
+            df["artist"] = fallback_name
+        df["artist"] = df["artist"].fillna(fallback_name)
+        if "source" not in df.columns:
+            df["source"] = None
+        records = df.to_dict("records")
+        for record in records:
+            record["source"] = _clean(record.get("source")) or _infer_source(record)
+        upsert_events(conn, records, replace_upcoming=False)
+        imported[table_name] = len(records)
+        if drop:
+            conn.execute(f'DROP TABLE "{table_name}"')
+            conn.commit()
+        print(f"📥 Imported {len(records)} rows from '{table_name}'")
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import per-artist tables into the unified events table.")
+    parser.add_argument("db", nargs="?", default="tour_data.db")
+    parser.add_argument("--drop", action="store_true", help="drop each legacy table after importing it")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="re-resolve every artist's shows across sources and recompute the dashboard rollups")
+    parser.add_argument("--normalize-dates", action="store_true",
+                        help="fill canonical dates on older rows; unparseable ones go to date_failures.csv")
+    parser.add_argument("--gazetteer", metavar="CITIES_FILE",
+                        help="GeoNames cities dump used to fill missing countries, regions and coordinates")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    imported = migrate_per_artist_tables(conn, drop=args.drop)
+    if args.normalize_dates:
+        filled, failed = normalize_stored_dates(conn)
+        print(f"📅 Normalized {filled} stored dates; {len(failed)} could not be parsed.")
+        if len(failed):
+            failed.to_csv("date_failures.csv", index=False)
+    if args.gazetteer:
+        print(f"🗺️ Filled the country of {geocode_stored_events(conn, gazetteer.Gazetteer(args.gazetteer))} stored events.")
+    if args.rebuild_rollups:
+        artists, merged = rebuild_derived(conn)
+        print(f"📊 Rebuilt shows and rollups for {artists} artists ({merged} cross-source duplicates merged).")
+    conn.close()
+    print(f"🏁 Migrated {len(imported)} tables, {sum(imported.values())} rows.")